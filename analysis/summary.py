@@ -0,0 +1,61 @@
+import pandas as pd
+
+# Ambang batas klinis WHO
+PR_THRESHOLD = 32
+NORMAL_MORPHOLOGY_THRESHOLD = 4
+
+
+def diagnose(pr_percent: float, normal_percent: float) -> str:
+    """
+    Map PR motility % and normal morphology % to a WHO indication
+    """
+    if pr_percent < PR_THRESHOLD and normal_percent < NORMAL_MORPHOLOGY_THRESHOLD:
+        return "Asthenoteratozoospermia"
+    if pr_percent < PR_THRESHOLD:
+        return "Asthenozoospermia"
+    if normal_percent < NORMAL_MORPHOLOGY_THRESHOLD:
+        return "Teratozoospermia"
+    return "Normozoospermia"
+
+
+def summarize_results(
+    motility_results: pd.DataFrame,
+    morphology_results: pd.DataFrame,
+    static_im_count: int = 0
+) -> dict:
+    """
+    Per-sample summary used by the dashboard and the results store:
+    particle counts, WHO percentages, diagnosis and mean confidences.
+    static_im_count adds objects removed by background subtraction
+    (preparation/background.py) to the IM population.
+    """
+    mot_counts = motility_results['motility_label'].value_counts() if len(motility_results) else pd.Series(dtype=int)
+    morf_counts = morphology_results['morphology_label'].value_counts() if len(morphology_results) else pd.Series(dtype=int)
+
+    total_motility = len(motility_results) + static_im_count
+    total_morphology = len(morphology_results)
+
+    pr_count = int(mot_counts.get('PR', 0))
+    normal_count = int(morf_counts.get('Normal', 0))
+
+    pr_percent = (pr_count / total_motility) * 100 if total_motility > 0 else 0
+    normal_percent = (normal_count / total_morphology) * 100 if total_morphology > 0 else 0
+
+    conf_mot = motility_results['confidence'].mean() * 100 if 'confidence' in motility_results.columns else 0
+    conf_mo = morphology_results['confidence'].mean() * 100 if 'confidence' in morphology_results.columns else 0
+
+    return {
+        'total_motility': total_motility,
+        'pr_count': pr_count,
+        'np_count': int(mot_counts.get('NP', 0)),
+        'im_count': int(mot_counts.get('IM', 0)) + static_im_count,
+        'static_im_count': static_im_count,
+        'total_morphology': total_morphology,
+        'normal_count': normal_count,
+        'abnormal_count': int(morf_counts.get('Abnormal', 0)),
+        'pr_percent': float(pr_percent),
+        'normal_percent': float(normal_percent),
+        'motility_confidence': float(conf_mot),
+        'morphology_confidence': float(conf_mo),
+        'diagnosis': diagnose(pr_percent, normal_percent),
+    }
@@ -0,0 +1,144 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from preparation.pipeline import prepare_video_pipeline
+from preparation.video_normalization import TARGET_FPS
+from models.motility_analyzer import run_motility_analysis, FRAMES_PER_CLIP
+from models.morphology_analyzer import run_morphology_analysis
+from analysis.summary import summarize_results
+
+# Sama dengan default min_frames di link_and_filter_tracks
+MIN_TRACK_FRAMES = 30
+
+# Window harus cukup panjang untuk clip motility dan filter_stubs,
+# dengan ruang agar partikel yang masuk di tengah window tetap lolos
+DEFAULT_WINDOW_FRAMES = 3 * max(FRAMES_PER_CLIP, MIN_TRACK_FRAMES)
+DEFAULT_N_WINDOWS = 4
+
+
+def probe_duration(video_path: str):
+    """
+    Duration in seconds from the container metadata, or None if the
+    container does not report fps / frame count
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    cap.release()
+    return frame_count / fps if fps > 0 and frame_count > 0 else None
+
+
+def plan_windows(
+    duration: float,
+    n_windows=DEFAULT_N_WINDOWS,
+    window_frames=DEFAULT_WINDOW_FRAMES,
+    fps=TARGET_FPS
+) -> list:
+    """
+    K windows (start, length) in seconds spread evenly over the recording.
+    Recordings shorter than K windows, or of unknown duration (None),
+    are analysed whole as one window (length None).
+    """
+    if duration is None:
+        return [(0.0, None)]
+
+    window_seconds = window_frames / fps
+    if duration <= n_windows * window_seconds:
+        return [(0.0, duration)]
+
+    starts = np.linspace(0.0, duration - window_seconds, n_windows)
+    return [(float(s), window_seconds) for s in starts]
+
+
+def _prepare_and_track(video_path, window_dir, start, length, detect_params):
+    # trackpy/numba dimuat saat window pertama di-track, bukan saat import
+    from tracking.pipeline import tracking_pipeline
+
+    prep_path = prepare_video_pipeline(
+        video_path, window_dir, start=start, duration=length, keep_intermediates=False
+    )
+    tracks = tracking_pipeline(
+        prep_path, os.path.join(window_dir, "tracks.csv"), detect_params=detect_params
+    )
+    return prep_path, tracks
+
+
+def run_windowed_analysis(
+    video_path: str,
+    working_dir: str,
+    motility_model_path: str,
+    n_windows=DEFAULT_N_WINDOWS,
+    window_frames=DEFAULT_WINDOW_FRAMES,
+    detect_params: dict = None,
+    max_workers=None
+) -> dict:
+    """
+    Multi-window sampling mode for long recordings:
+    1. Pick K short windows spread across the recording
+    2. Prepare + track every window in parallel
+    3. Classify motility & morphology per window as soon as it is tracked
+    4. Merge per-window results (particle IDs are unique per window only,
+       so results carry a 'window' column) into the WHO summary
+
+    Returns dict with windows, tracks, motility_results,
+    morphology_results, prepared_videos and summary.
+    """
+    windows = plan_windows(probe_duration(video_path), n_windows, window_frames)
+    max_workers = max_workers or len(windows)
+
+    tracks, motility, morphology, prepared = [], [], [], {}
+    window_rows = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(
+                _prepare_and_track, video_path,
+                os.path.join(working_dir, f"window_{i:02d}"),
+                start, length, detect_params
+            ): i
+            for i, (start, length) in enumerate(windows)
+        }
+
+        # Klasifikasi di thread utama, overlap dengan preparation window lain
+        for future in as_completed(futures):
+            i = futures[future]
+            start, length = windows[i]
+            try:
+                prep_path, t = future.result()
+            except ValueError:
+                # "No sperm detected" pada window ini
+                window_rows.append({'window': i, 'start': start, 'duration': length, 'particles': 0})
+                continue
+
+            mot = run_motility_analysis(prep_path, t, motility_model_path)
+            morf = run_morphology_analysis(prep_path, t)
+
+            prepared[i] = prep_path
+            tracks.append(t.assign(window=i))
+            motility.append(mot.assign(window=i))
+            morphology.append(morf.assign(window=i))
+            window_rows.append({
+                'window': i, 'start': start, 'duration': length,
+                'particles': int(t['particle'].nunique())
+            })
+
+    if not tracks:
+        raise ValueError("No sperm detected in any sampled window")
+
+    motility_results = pd.concat(motility, ignore_index=True)
+    morphology_results = pd.concat(morphology, ignore_index=True)
+
+    return {
+        'windows': pd.DataFrame(window_rows).sort_values('window').reset_index(drop=True),
+        'tracks': pd.concat(tracks, ignore_index=True),
+        'motility_results': motility_results,
+        'morphology_results': morphology_results,
+        'prepared_videos': dict(sorted(prepared.items())),
+        'summary': summarize_results(motility_results, morphology_results),
+    }
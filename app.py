@@ -2,12 +2,21 @@ import streamlit as st
 import pandas as pd
 import cv2
 import os
-import tempfile
+import time
 import numpy as np
 from preparation.pipeline import prepare_video_pipeline
-from tracking.pipeline import tracking_pipeline
+from preparation.background import count_static_objects
+from preparation.quality_check import run_quality_check
+from tracking.visualization import TrackOverlay
 from models.motility_analyzer import run_motility_analysis
 from models.morphology_analyzer import run_morphology_analysis
+from upload.video_renderer import iter_motility_segments, concat_motility_segments
+from analysis.summary import summarize_results, PR_THRESHOLD, NORMAL_MORPHOLOGY_THRESHOLD
+from analysis.windowed import run_windowed_analysis, DEFAULT_N_WINDOWS
+from storage.results_store import ResultsStore
+from upload.workspace import Workspace
+# tracking.pipeline / tracking.tuning (trackpy + numba) dan TensorFlow di models
+# di-import saat tahapnya pertama kali jalan, agar tab Home tampil cepat
 
 # ==========================================
 # 1. CONFIG & STYLE
@@ -33,6 +42,13 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+DIAGNOSIS_STYLE = {
+    "Asthenoteratozoospermia": ("Motilitas & Morfologi Normal Rendah", "#721c24"),
+    "Asthenozoospermia": ("Gerak Sperma Rendah", "#dc3545"),
+    "Teratozoospermia": ("Bentuk Normal Rendah", "#fd7e14"),
+    "Normozoospermia": ("Sampel Normal (Sesuai Standar WHO)", "#28a745"),
+}
+
 # ==========================================
 # 2. SESSION STATE
 # ==========================================
@@ -40,6 +56,54 @@ if 'tracks_df' not in st.session_state: st.session_state.tracks_df = None
 if 'prepared_video' not in st.session_state: st.session_state.prepared_video = None
 if 'motility_results' not in st.session_state: st.session_state.motility_results = None
 if 'morphology_results' not in st.session_state: st.session_state.morphology_results = None
+if 'stage_timings' not in st.session_state: st.session_state.stage_timings = {}
+if 'saved_sample_id' not in st.session_state: st.session_state.saved_sample_id = None
+if 'detect_params' not in st.session_state: st.session_state.detect_params = None
+if 'static_im_count' not in st.session_state: st.session_state.static_im_count = 0
+
+
+@st.cache_resource
+def get_results_store():
+    return ResultsStore()
+
+
+@st.cache_resource
+def get_workspace():
+    return Workspace()
+
+
+@st.cache_resource
+def start_tracking_warmup():
+    # Sekali per proses server: kompilasi numba trackpy di background selagi user upload
+    from tracking.warmup import start_background_warmup
+    return start_background_warmup()
+
+
+start_tracking_warmup()
+
+
+def particle_keys(df):
+    # Mode multi-window: ID partikel hanya unik di dalam satu window
+    return ['window', 'particle'] if 'window' in df.columns else ['particle']
+
+
+def read_video_frame(video_path, frame_idx):
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+    ret, frame = cap.read()
+    cap.release()
+    return frame if ret else None
+
+
+# Job sesi ini bisa saja sudah dibersihkan (lease kedaluwarsa / restart server)
+if st.session_state.tracks_df is not None and not (
+    st.session_state.get('work_dir') and os.path.isdir(st.session_state.work_dir)
+    and st.session_state.prepared_video and os.path.exists(st.session_state.prepared_video)
+):
+    for key in ['tracks_df', 'track_overlay', 'sample_frame', 'motility_results',
+                'morphology_results', 'motility_video', 'work_dir', 'prepared_video', 'last_video_id']:
+        st.session_state[key] = None
+    st.warning("File kerja sesi ini sudah tidak tersedia. Silakan upload ulang video untuk memproses kembali.")
 
 # ==========================================
 # 3. TAB NAVIGATION
@@ -90,39 +154,120 @@ with tab1:
 # ------------------------------------------
 with tab2:
     st.header("Upload & Digital Processing")
+    mode_col1, mode_col2 = st.columns([3, 1])
+    windowed = mode_col1.checkbox(
+        "Mode sampling multi-window (rekaman panjang)", key="windowed_mode",
+        help="Analisis hanya beberapa window pendek yang tersebar di sepanjang rekaman, diproses paralel."
+    )
+    n_windows = mode_col2.number_input("Jumlah window", 2, 16, DEFAULT_N_WINDOWS, disabled=not windowed)
+    subtract_bg = st.checkbox(
+        "Background subtraction (hapus debris & sel statis sebelum tracking)", key="subtract_bg",
+        disabled=windowed,
+        help="Objek statis dihitung terpisah dan tetap dimasukkan sebagai IM."
+    ) and not windowed
     video_file = st.file_uploader("Pilih Video Sperma", type=['mp4', 'avi'], key="sperm_video_uploader")
 
     if video_file:
         current_video_id = f"{video_file.name}_{video_file.size}"
+        if windowed:
+            current_video_id += f"_w{n_windows}"
+        if subtract_bg:
+            current_video_id += "_bg"
         
         if st.session_state.get('last_video_id') != current_video_id:
+            # Folder job video sebelumnya tidak dipakai lagi
+            get_workspace().release(st.session_state.get('work_dir'))
+            st.session_state.work_dir = None
             st.session_state.tracks_df = None
             st.session_state.sample_frame = None
+            st.session_state.track_overlay = None
+            st.session_state.tuning_results = None
+            st.session_state.stage_timings = {}
+            st.session_state.saved_sample_id = None
+            st.session_state.static_im_count = 0
+            st.session_state.motility_video = None
             st.session_state.last_video_id = current_video_id
 
         if st.session_state.tracks_df is None:
-            tfile = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-            tfile.write(video_file.read())
+            workspace = get_workspace()
+            workspace.release(st.session_state.get('work_dir'))
+            temp_dir = workspace.create_job("upload")
+            st.session_state.work_dir = temp_dir
+            input_path = workspace.save_upload(video_file, temp_dir)
+
+            # QC cepat pada beberapa frame sebelum normalisasi/tracking/CNN yang mahal
+            t0 = time.perf_counter()
+            qc = run_quality_check(input_path, st.session_state.detect_params)
+            st.session_state.stage_timings['quality_check'] = time.perf_counter() - t0
+            qc_table = pd.DataFrame(qc['checks'])
+            if qc['verdict'] == 'fail':
+                workspace.release(temp_dir)
+                st.session_state.work_dir = None
+                st.error("Video ditolak oleh quality check. Perbaiki fokus/pencahayaan/rekaman lalu upload ulang.")
+                st.dataframe(qc_table[qc_table['status'] != 'pass'], use_container_width=True)
+                st.stop()
+            if qc['verdict'] == 'warn':
+                st.warning("Quality check: " + "; ".join(
+                    f"{c['message']} ({c['value']})" for c in qc['checks'] if c['status'] == 'warn'
+                ))
             
             with st.status("Preprocessing and Tracking are Running") as status:
-                temp_dir = tempfile.mkdtemp()
-                cap = cv2.VideoCapture(tfile.name)
+                cap = cv2.VideoCapture(input_path)
                 ret, frame = cap.read()
+                cap.release()
                 if ret:
                     st.session_state.sample_frame = frame
                 
-                prep_path = prepare_video_pipeline(tfile.name, temp_dir)
-                st.session_state.prepared_video = prep_path
-                
-                df = tracking_pipeline(prep_path, os.path.join(temp_dir, "tracks.csv"))
+                if windowed:
+                    # Preparation s/d klasifikasi per window, paralel
+                    t0 = time.perf_counter()
+                    result = run_windowed_analysis(
+                        input_path, temp_dir, "model_motility.h5",
+                        n_windows=n_windows, detect_params=st.session_state.detect_params
+                    )
+                    st.session_state.stage_timings['windowed_analysis'] = time.perf_counter() - t0
+
+                    first_window = next(iter(result['prepared_videos']))
+                    st.session_state.prepared_video = result['prepared_videos'][first_window]
+                    st.session_state.motility_results = result['motility_results']
+                    st.session_state.morphology_results = result['morphology_results']
+                    df = result['tracks']
+                    overlay_df = df[df['window'] == first_window]
+                else:
+                    t0 = time.perf_counter()
+                    prep_path = prepare_video_pipeline(
+                        input_path, temp_dir, keep_intermediates=False, subtract_bg=subtract_bg
+                    )
+                    st.session_state.prepared_video = prep_path
+                    st.session_state.stage_timings['preparation'] = time.perf_counter() - t0
+                    
+                    t0 = time.perf_counter()
+                    from tracking.pipeline import tracking_pipeline
+                    df = tracking_pipeline(
+                        prep_path, os.path.join(temp_dir, "tracks.csv"),
+                        detect_params=st.session_state.detect_params
+                    )
+                    st.session_state.stage_timings['tracking'] = time.perf_counter() - t0
+                    overlay_df = df
+
+                    if subtract_bg:
+                        # Sel yang menempel di slide hilang dari video, hitung dari background
+                        st.session_state.static_im_count = count_static_objects(
+                            os.path.join(temp_dir, "background.png"), df,
+                            **(st.session_state.detect_params or {})
+                        )
                 if 'frame' not in df.columns:
                     df = df.reset_index()
                 else:
                     df = df.reset_index(drop=True)
                 st.session_state.tracks_df = df
+                st.session_state.track_overlay = TrackOverlay(overlay_df)
+                # Video upload asli tidak dibutuhkan lagi setelah preprocessing
+                os.remove(input_path)
                 status.update(label="Preprocessing & Tracking Selesai!", state="complete")
 
         if st.session_state.tracks_df is not None:
+            get_workspace().touch(st.session_state.work_dir)
             if st.session_state.sample_frame is not None:
                 st.write("### Visualisasi Tahap A (Preprocessing)")
                 f1, f2, f3 = st.columns(3)
@@ -133,10 +278,64 @@ with tab2:
 
             st.write("### Visualisasi Tahap B (Tracking Data)")
             m1, m2 = st.columns(2)
-            m1.markdown(f"<div class='metric-container'><h4>Total Partikel</h4><h2>{st.session_state.tracks_df['particle'].nunique()}</h2></div>", unsafe_allow_html=True)
+            m1.markdown(f"<div class='metric-container'><h4>Total Partikel</h4><h2>{st.session_state.tracks_df.groupby(particle_keys(st.session_state.tracks_df)).ngroups}</h2></div>", unsafe_allow_html=True)
             m2.markdown(f"<div class='metric-container'><h4>Total Lintasan</h4><h2>{len(st.session_state.tracks_df)}</h2></div>", unsafe_allow_html=True)
             st.dataframe(st.session_state.tracks_df.head(50), use_container_width=True)
 
+            # Frame scrubber: overlay dirender dari TrackOverlay yang dibuat sekali per tracks table
+            overlay = st.session_state.get('track_overlay')
+            if overlay is None:
+                overlay = st.session_state.track_overlay = TrackOverlay(st.session_state.tracks_df)
+
+            if overlay.n_frames > 0:
+                st.write("### Jelajahi Frame (Deteksi & Lintasan)")
+                s1, s2 = st.columns([3, 1])
+                frame_idx = s1.slider("Frame", 0, overlay.n_frames - 1, 0, key="scrub_frame")
+                mode = s2.radio("Overlay", ["Lintasan", "Deteksi"], key="scrub_mode")
+
+                frame = read_video_frame(st.session_state.prepared_video, frame_idx)
+                if frame is not None:
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                    if mode == "Lintasan":
+                        vis = overlay.render(gray, frame_idx)
+                    else:
+                        vis = overlay.render_detections(gray, frame_idx)
+                    st.image(vis, channels="BGR", caption=f"Frame {frame_idx}", use_container_width=True)
+
+            # Auto-tune hanya untuk mode analisis penuh (video hasil preprocessing tunggal)
+            if 'window' not in st.session_state.tracks_df.columns:
+                with st.expander("🎛️ Auto-Tune Parameter Deteksi"):
+                    st.caption("Sweep diameter/minmass/separation pada sebagian frame video hasil preprocessing, tanpa mengulang upload.")
+                    if st.button("Jalankan Sweep Parameter"):
+                        with st.spinner("Parameter sweep is Running"):
+                            from tracking.tuning import auto_tune_detector
+                            params, sweep_df = auto_tune_detector(st.session_state.prepared_video)
+                        st.session_state.tuning_results = (params, sweep_df)
+
+                    if st.session_state.get('tuning_results') is not None:
+                        params, sweep_df = st.session_state.tuning_results
+                        st.write("**Parameter yang disarankan:**", params)
+                        st.dataframe(sweep_df, use_container_width=True)
+                        if st.button("🔁 Tracking Ulang dengan Parameter Ini"):
+                            with st.spinner("Tracking is Running"):
+                                st.session_state.detect_params = params
+                                t0 = time.perf_counter()
+                                from tracking.pipeline import tracking_pipeline
+                                df = tracking_pipeline(
+                                    st.session_state.prepared_video,
+                                    os.path.join(st.session_state.work_dir, "tracks.csv"),
+                                    detect_params=params
+                                ).reset_index(drop=True)
+                                st.session_state.stage_timings['tracking'] = time.perf_counter() - t0
+                                background_path = os.path.join(st.session_state.work_dir, "background.png")
+                                if os.path.exists(background_path):
+                                    st.session_state.static_im_count = count_static_objects(background_path, df, **params)
+                            st.session_state.tracks_df = df
+                            st.session_state.track_overlay = TrackOverlay(df)
+                            st.session_state.motility_results = None
+                            st.session_state.morphology_results = None
+                            st.rerun()
+
 # ------------------------------------------
 # TAB 3: ANALYSIS PROCESS
 # ------------------------------------------
@@ -146,18 +345,26 @@ with tab3:
     if st.session_state.tracks_df is None:
         st.warning("Silakan selesaikan proses di Tab 2 (Upload & Tracking) terlebih dahulu.")
     else:
-        if st.button("🚀 Jalankan Analisis Motility dan Morfologi"):
+        if 'window' in st.session_state.tracks_df.columns:
+            st.info("Mode multi-window: klasifikasi sudah dijalankan per window saat upload.")
+        elif st.button("🚀 Jalankan Analisis Motility dan Morfologi"):
             with st.spinner("Analysis Process is Running"):
+                t0 = time.perf_counter()
                 st.session_state.motility_results = run_motility_analysis(
                     st.session_state.prepared_video, 
                     st.session_state.tracks_df, 
                     "model_motility.h5"
                 )
+                st.session_state.stage_timings['motility'] = time.perf_counter() - t0
                 
+                t0 = time.perf_counter()
                 st.session_state.morphology_results = run_morphology_analysis(
                     st.session_state.prepared_video, 
                     st.session_state.tracks_df
                 )
+                st.session_state.stage_timings['morphology'] = time.perf_counter() - t0
+                st.session_state.saved_sample_id = None
+                st.session_state.motility_video = None
             st.success("Analisis Motilitas & Morfologi Selesai!")
 
         if st.session_state.motility_results is not None and st.session_state.morphology_results is not None:
@@ -179,19 +386,52 @@ with tab3:
             st.subheader("📋 Tabel Summary Klasifikasi")
             
             # Penggabungan data dengan menyertakan kolom confidence
-            df_mot = st.session_state.motility_results[['particle', 'motility_label']]
-            df_morf = st.session_state.morphology_results[['particle', 'morphology_label']]
+            keys = particle_keys(st.session_state.tracks_df)
+            df_mot = st.session_state.motility_results[[*keys, 'motility_label']]
+            df_morf = st.session_state.morphology_results[[*keys, 'morphology_label']]
             
-            summary_df = pd.merge(df_mot, df_morf, on='particle', how='inner')
-            coords = st.session_state.tracks_df.groupby('particle').first().reset_index()[['particle', 'x', 'y', 'frame']]
-            final_summary = pd.merge(coords, summary_df, on='particle', how='inner')
+            summary_df = pd.merge(df_mot, df_morf, on=keys, how='inner')
+            coords = st.session_state.tracks_df.groupby(keys).first().reset_index()[[*keys, 'x', 'y', 'frame']]
+            final_summary = pd.merge(coords, summary_df, on=keys, how='inner')
             
             # Menampilkan tabel dengan kolom confidence agar terlihat progresnya
-            final_summary = final_summary[['x', 'y', 'frame', 'particle', 'motility_label', 'morphology_label']]
-            final_summary.columns = ['X', 'Y', 'Frame', 'ID Particle', 'Motility', 'Morphology']
+            final_summary = final_summary[['x', 'y', 'frame', *keys, 'motility_label', 'morphology_label']]
+            final_summary.columns = ['X', 'Y', 'Frame', *(['Window'] if 'window' in keys else []), 'ID Particle', 'Motility', 'Morphology']
             
             st.dataframe(final_summary, use_container_width=True)
-            
+
+            st.divider()
+            st.subheader("🎬 Video Anotasi Motilitas")
+            if st.button("Render Video Anotasi"):
+                tracks = st.session_state.tracks_df
+                mot = st.session_state.motility_results
+                if 'window' in tracks.columns:
+                    # prepared_video = window pertama
+                    first_window = tracks['window'].min()
+                    tracks = tracks[tracks['window'] == first_window]
+                    mot = mot[mot['window'] == first_window]
+
+                # Segmen pertama langsung diputar, sisanya dirender paralel di belakang;
+                # player tidak disentuh sampai semua segmen digabung jadi satu video
+                player = st.empty()
+                progress = st.progress(0.0, text="Rendering segmen video...")
+                segment_dir = None
+                for i, n_segments, path in iter_motility_segments(st.session_state.prepared_video, tracks, mot):
+                    segment_dir = os.path.dirname(path)
+                    if i == 0:
+                        player.video(path)
+                    progress.progress((i + 1) / n_segments, text=f"Segmen {i + 1}/{n_segments} siap")
+                if segment_dir:
+                    progress.progress(1.0, text="Menggabungkan segmen...")
+                    st.session_state.motility_video = concat_motility_segments(
+                        os.path.join(segment_dir, "manifest.json")
+                    )
+                progress.empty()
+                player.empty()
+
+            if st.session_state.get('motility_video'):
+                st.video(st.session_state.motility_video)
+
 # ------------------------------------------
 # TAB 4: SUMMARY DASHBOARD
 # ------------------------------------------
@@ -201,23 +441,14 @@ with tab4:
     else:
         m_res = st.session_state.motility_results
         mo_res = st.session_state.morphology_results
-        total_sperma = len(m_res)
+        summary = summarize_results(m_res, mo_res, st.session_state.static_im_count)
 
-        pr_val = len(m_res[m_res['motility_label'] == 'PR'])
-        pr_percent = (pr_val / total_sperma) * 100 if total_sperma > 0 else 0
-        
-        normal_mo_val = len(mo_res[mo_res['morphology_label'] == 'Normal'])
-        normal_mo_percent = (normal_mo_val / len(mo_res)) * 100 if len(mo_res) > 0 else 0
+        pr_percent = summary['pr_percent']
+        normal_mo_percent = summary['normal_percent']
 
         # Diagnosis Logic
-        if pr_percent < 32 and normal_mo_percent < 4:
-            status_f, deskripsi, bg_color = "Asthenoteratozoospermia", "Motilitas & Morfologi Normal Rendah", "#721c24"
-        elif pr_percent < 32:
-            status_f, deskripsi, bg_color = "Asthenozoospermia", "Gerak Sperma Rendah", "#dc3545"
-        elif normal_mo_percent < 4:
-            status_f, deskripsi, bg_color = "Teratozoospermia", "Bentuk Normal Rendah", "#fd7e14"
-        else:
-            status_f, deskripsi, bg_color = "Normozoospermia", "Sampel Normal (Sesuai Standar WHO)", "#28a745"
+        status_f = summary['diagnosis']
+        deskripsi, bg_color = DIAGNOSIS_STYLE[status_f]
 
         # 1. Header Diagnosis
         st.markdown(f"""
@@ -229,43 +460,36 @@ with tab4:
         """, unsafe_allow_html=True)
 
         # 2. Body Panel
+        im_caption = f"IM (statis: {summary['static_im_count']})" if summary['static_im_count'] else "IM"
         st.markdown(f"""
             <div style='background-color: #f8f9fa; padding: 20px; border-radius: 0 0 15px 15px; border: 1px solid #e9ecef; border-top: none;'>
                 <div style='display: flex; justify-content: space-around; text-align: center;'>
                     <div style='flex: 1; border-right: 1px solid #dee2e6;'>
                         <p style='margin-bottom:0; color: #6c757d;'>PR Motility</p>
                         <h2 style='color:{bg_color}; margin-top:0;'>{pr_percent:.1f}%</h2>
-                        <small style='color: #adb5bd;'>Threshold: 32%</small>
+                        <small style='color: #adb5bd;'>Threshold: {PR_THRESHOLD}%</small>
                     </div>
                     <div style='flex: 1;'>
                         <p style='margin-bottom:0; color: #6c757d;'>Normal Morphology</p>
                         <h2 style='color:{bg_color}; margin-top:0;'>{normal_mo_percent:.1f}%</h2>
-                        <small style='color: #adb5bd;'>Threshold: 4%</small>
+                        <small style='color: #adb5bd;'>Threshold: {NORMAL_MORPHOLOGY_THRESHOLD}%</small>
                     </div>
                 </div>
                 <hr style='margin: 20px 0; border: 0.5px solid #dee2e6;'>
                 <p style='text-align: center; font-weight: bold; color: #495057; margin-bottom: 15px;'>Detail Perhitungan Partikel</p>
                 <div style='display: flex; justify-content: space-between; text-align: center;'>
-                    <div style='flex: 1; border-right: 1px solid #dee2e6;'><small style='color: #6c757d;'>PR</small><h4 style='margin:0;'>{m_res['motility_label'].value_counts().get('PR', 0)}</h4></div>
-                    <div style='flex: 1; border-right: 1px solid #dee2e6;'><small style='color: #6c757d;'>NP</small><h4 style='margin:0;'>{m_res['motility_label'].value_counts().get('NP', 0)}</h4></div>
-                    <div style='flex: 1; border-right: 1px solid #dee2e6;'><small style='color: #6c757d;'>IM</small><h4 style='margin:0;'>{m_res['motility_label'].value_counts().get('IM', 0)}</h4></div>
-                    <div style='flex: 1; border-right: 1px solid #dee2e6;'><small style='color: #6c757d;'>Normal</small><h4 style='margin:0;'>{mo_res['morphology_label'].value_counts().get('Normal', 0)}</h4></div>
-                    <div style='flex: 1;'><small style='color: #6c757d;'>Abnormal</small><h4 style='margin:0;'>{mo_res['morphology_label'].value_counts().get('Abnormal', 0)}</h4></div>
+                    <div style='flex: 1; border-right: 1px solid #dee2e6;'><small style='color: #6c757d;'>PR</small><h4 style='margin:0;'>{summary['pr_count']}</h4></div>
+                    <div style='flex: 1; border-right: 1px solid #dee2e6;'><small style='color: #6c757d;'>NP</small><h4 style='margin:0;'>{summary['np_count']}</h4></div>
+                    <div style='flex: 1; border-right: 1px solid #dee2e6;'><small style='color: #6c757d;'>{im_caption}</small><h4 style='margin:0;'>{summary['im_count']}</h4></div>
+                    <div style='flex: 1; border-right: 1px solid #dee2e6;'><small style='color: #6c757d;'>Normal</small><h4 style='margin:0;'>{summary['normal_count']}</h4></div>
+                    <div style='flex: 1;'><small style='color: #6c757d;'>Abnormal</small><h4 style='margin:0;'>{summary['abnormal_count']}</h4></div>
                 </div>
             </div>
         """, unsafe_allow_html=True)
         
         # --- 3. AI CONFIDENCE SCORE (Visualisasi di Tab 4) ---
-        m_res = st.session_state.motility_results
-        mo_res = st.session_state.morphology_results
-        
-        # Ambil rata-rata confidence dari masing-masing model
-        # Karena kolom ini ada di masing-masing DataFrame asli, tidak akan error
-        conf_mot = m_res['confidence'].mean() * 100 if 'confidence' in m_res.columns else 0
-        conf_mo = mo_res['confidence'].mean() * 100 if 'confidence' in mo_res.columns else 0
-        
-        # Nilai Akhir Gabungan
-        sys_conf = (conf_mot + conf_mo) / 2
+        # Nilai Akhir Gabungan dari rata-rata confidence masing-masing model
+        sys_conf = (summary['motility_confidence'] + summary['morphology_confidence']) / 2
 
         st.markdown(f"""
             <div style='display: flex; flex-direction: column; align-items: center; margin-top: 15px; padding: 15px; background-color: #f8f9fa; border-radius: 12px; border: 1px dashed #ced4da;'>
@@ -282,9 +506,38 @@ with tab4:
             </div>
         """, unsafe_allow_html=True)
         
-        # 4. RESET BUTTON
+        # 4. SIMPAN KE DATABASE
+        st.write("")
+        store = get_results_store()
+        with st.expander("💾 Simpan Hasil ke Database Laboratorium", expanded=st.session_state.saved_sample_id is None):
+            patient_id = st.text_input("ID Pasien / Sampel", key="patient_id")
+            if st.session_state.saved_sample_id is not None:
+                st.success(f"Tersimpan dengan ID sampel {st.session_state.saved_sample_id}")
+            elif st.button("Simpan Hasil", use_container_width=True):
+                st.session_state.saved_sample_id = store.save_sample(
+                    m_res, mo_res,
+                    patient_id=patient_id.strip() or None,
+                    video_name=st.session_state.get('last_video_id'),
+                    stage_timings=st.session_state.stage_timings,
+                    static_im_count=st.session_state.static_im_count
+                )
+                st.rerun()
+
+        with st.expander("📈 Riwayat Laboratorium"):
+            monthly = store.monthly_pr_distribution()
+            if monthly.empty:
+                st.info("Belum ada sampel tersimpan.")
+            else:
+                st.write("**Distribusi PR% per Bulan**")
+                st.line_chart(monthly.set_index('month')[['p25', 'median', 'p75']])
+                st.dataframe(monthly, use_container_width=True)
+                st.write("**Jumlah Sampel per Diagnosis**")
+                st.bar_chart(store.diagnosis_counts().set_index('diagnosis'), color="#007bff")
+
+        # 5. RESET BUTTON
         st.write("")
         if st.button("🔄 Reset Analisis & Mulai Baru", use_container_width=True):
+            get_workspace().release(st.session_state.get('work_dir'))
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
             st.rerun()
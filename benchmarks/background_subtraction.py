@@ -0,0 +1,72 @@
+"""
+Detections and locate/link time with and without background subtraction.
+
+    python -m benchmarks.background_subtraction temp/videos/S_0001.mp4
+
+Both variants go through prepare_video_pipeline from the same input; the
+static objects removed by subtraction are reported as the IM population
+that summarize_results adds back.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import trackpy as tp
+
+from preparation.pipeline import prepare_video_pipeline
+from preparation.background import count_static_objects
+from tracking.batch import batch_detect_sperm
+from tracking.linking import link_and_filter_tracks
+
+
+def run_variant(video_path, working_dir, subtract_bg):
+    t0 = time.perf_counter()
+    prep_path = prepare_video_pipeline(video_path, working_dir, subtract_bg=subtract_bg)
+    t1 = time.perf_counter()
+    detections = batch_detect_sperm(prep_path)
+    t2 = time.perf_counter()
+    tracks = link_and_filter_tracks(detections)
+    t3 = time.perf_counter()
+
+    row = {
+        'variant': 'background subtraction' if subtract_bg else 'baseline',
+        'detections': len(detections),
+        'tracked_particles': int(tracks['particle'].nunique()) if len(tracks) else 0,
+        'prepare_s': t1 - t0,
+        'locate_s': t2 - t1,
+        'link_s': t3 - t2,
+        'static_im': 0,
+    }
+    if subtract_bg:
+        row['static_im'] = count_static_objects(os.path.join(working_dir, "background.png"), tracks)
+    return row
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video")
+    args = parser.parse_args()
+
+    tp.quiet()
+    # Kompilasi numba tidak ikut terukur
+    tp.locate(np.zeros((64, 64), dtype=np.uint8), 21, engine="numba")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = [
+            run_variant(args.video, os.path.join(tmp, "baseline"), subtract_bg=False),
+            run_variant(args.video, os.path.join(tmp, "bg"), subtract_bg=True),
+        ]
+
+    df = pd.DataFrame(rows).set_index('variant')
+    print(df.to_string(float_format=lambda v: f"{v:.2f}"))
+
+    base, bg = df.iloc[0], df.iloc[1]
+    print()
+    print(f"detections saved : {int(base['detections'] - bg['detections'])} "
+          f"({100 * (1 - bg['detections'] / max(base['detections'], 1)):.1f}%)")
+    print(f"locate+link saved: {base['locate_s'] + base['link_s'] - bg['locate_s'] - bg['link_s']:.2f} s")
+    print(f"tracked + static : {int(bg['tracked_particles'] + bg['static_im'])} "
+          f"(baseline tracked {int(base['tracked_particles'])})")
@@ -0,0 +1,83 @@
+"""
+Cold-process import time of the modules app.py imports at the top.
+
+    python -m benchmarks.import_time --budget 1.0
+
+Every module is imported in a fresh interpreter. The script fails (exit 1)
+if the app-level imports take longer than --budget seconds, or if they pull
+in a heavy library that should only load when its stage first runs.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modul yang di-import app.py di top-level (tanpa streamlit)
+APP_IMPORTS = [
+    "preparation.pipeline",
+    "preparation.background",
+    "preparation.quality_check",
+    "upload.video_renderer",
+    "tracking.visualization",
+    "models.motility_analyzer",
+    "models.morphology_analyzer",
+    "analysis.summary",
+    "analysis.windowed",
+    "storage.results_store",
+    "upload.workspace",
+]
+
+# Hanya boleh dimuat oleh tahap yang membutuhkannya
+HEAVY_MODULES = ["tensorflow", "keras", "huggingface_hub", "trackpy", "numba"]
+
+# Dimuat saat tahap pertama jalan, untuk perbandingan
+STAGE_IMPORTS = ["tracking.pipeline", "tracking.tuning", "tensorflow.keras.models"]
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - t0
+heavy = sorted({{m.split('.')[0] for m in sys.modules}} & set({heavy!r}))
+print(json.dumps({{'seconds': elapsed, 'heavy': heavy}}))
+"""
+
+
+def cold_import(modules) -> dict:
+    """
+    Import modules in a fresh interpreter; returns seconds and heavy libraries loaded
+    """
+    code = _PROBE.format(modules=list(modules), heavy=HEAVY_MODULES)
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=REPO_ROOT
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=1.0, help="Max seconds for the app-level imports")
+    parser.add_argument("--stages", action="store_true", help="Also time the lazily imported stage modules")
+    args = parser.parse_args()
+
+    app = cold_import(APP_IMPORTS)
+    print(f"{'app-level imports':<28} {app['seconds']:6.2f} s  heavy: {', '.join(app['heavy']) or '-'}")
+
+    if args.stages:
+        for name in STAGE_IMPORTS:
+            stage = cold_import([name])
+            print(f"{name:<28} {stage['seconds']:6.2f} s  heavy: {', '.join(stage['heavy']) or '-'}")
+
+    failures = []
+    if app['heavy']:
+        failures.append(f"heavy libraries imported at startup: {', '.join(app['heavy'])}")
+    if app['seconds'] > args.budget:
+        failures.append(f"app-level imports took {app['seconds']:.2f} s (budget {args.budget:.2f} s)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,301 @@
+"""
+Multi-user load test for the analysis pipeline, fully offline.
+
+    python -m benchmarks.load_test --synthetic --concurrency 1,2,4 --iterations 2
+    python -m benchmarks.load_test temp/videos/S_0001.mp4 --motility-model model_motility.h5
+
+Every simulated session is a thread running the same stage sequence as
+app.py (prepare_video_pipeline -> tracking_pipeline -> run_motility_analysis
+-> run_morphology_analysis) on its own workspace job, like Streamlit script
+threads in one server process. For each concurrency level it reports
+throughput, p50/p95/p99 latency per stage, RSS rise over the level's
+baseline (including ffmpeg / tp.batch child processes) and CPU saturation;
+the rows together are the capacity curve.
+
+Model stages are skipped when their model is not available locally
+(--motility-model, SPERMTRACK_MORPHOLOGY_MODEL or the Hugging Face cache
+with HF_HUB_OFFLINE=1).
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import traceback
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from preparation.pipeline import prepare_video_pipeline
+from upload.workspace import Workspace
+
+STAGES = ["prepare", "tracking", "motility", "morphology"]
+MONITOR_INTERVAL = 0.2
+
+
+def make_synthetic_video(
+    path: str,
+    seconds=3.0,
+    fps=30,
+    size=(640, 480),
+    n_sperm=40,
+    static_fraction=0.3,
+    seed=0
+) -> str:
+    """
+    Bright noisy background with dark gaussian heads: a mix of straight
+    swimmers, random walkers and static cells
+    """
+    rng = np.random.default_rng(seed)
+    w, h = size
+    n_frames = int(seconds * fps)
+
+    pos = rng.uniform([20, 20], [w - 20, h - 20], (n_sperm, 2))
+    velocity = rng.normal(0, 3, (n_sperm, 2))
+    static = rng.random(n_sperm) < static_fraction
+    velocity[static] = 0
+
+    yy, xx = np.mgrid[:h, :w]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for _ in range(n_frames):
+        img = np.full((h, w), 190.0)
+        for x, y in pos:
+            x0, x1 = int(max(0, x - 12)), int(min(w, x + 12))
+            y0, y1 = int(max(0, y - 12)), int(min(h, y + 12))
+            d2 = (xx[y0:y1, x0:x1] - x) ** 2 + (yy[y0:y1, x0:x1] - y) ** 2
+            img[y0:y1, x0:x1] -= 140 * np.exp(-d2 / (2 * 3.5 ** 2))
+        frame = np.clip(img + rng.normal(0, 4, img.shape), 0, 255).astype(np.uint8)
+        writer.write(cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR))
+
+        jitter = rng.normal(0, 0.8, pos.shape)
+        jitter[static] = 0
+        pos = np.clip(pos + velocity + jitter, 5, [w - 5, h - 5])
+    writer.release()
+    return path
+
+
+class ResourceMonitor:
+    """
+    Samples RSS of this process plus all its children (ffmpeg, tp.batch
+    workers) from /proc and process + children CPU time on a background
+    thread. Memory is reported as the rise over the RSS at __enter__, so
+    a level does not inherit the peak of the levels before it.
+    """
+
+    def __init__(self, interval=MONITOR_INTERVAL):
+        self.interval = interval
+        self.baseline_rss = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def _proc_rss(pid) -> int:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass  # proses sudah selesai
+        return 0
+
+    @staticmethod
+    def _descendants(pid) -> list:
+        # Peta parent -> children dari /proc/<pid>/stat (field ke-4 = ppid)
+        children = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+
+        found, stack = [], [pid]
+        while stack:
+            for child in children.get(stack.pop(), ()):
+                found.append(child)
+                stack.append(child)
+        return found
+
+    @classmethod
+    def rss_bytes(cls) -> int:
+        """RSS of this process and all its descendants"""
+        pid = os.getpid()
+        return cls._proc_rss(pid) + sum(cls._proc_rss(c) for c in cls._descendants(pid))
+
+    @staticmethod
+    def cpu_seconds() -> float:
+        # Termasuk child process: ffmpeg dan worker tp.batch
+        t = os.times()
+        return t.user + t.system + t.children_user + t.children_system
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_rss = max(self.peak_rss, self.rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.baseline_rss = self.peak_rss = self.rss_bytes()
+        self.t0, self.cpu0 = time.perf_counter(), self.cpu_seconds()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, self.rss_bytes())
+        self.wall = time.perf_counter() - self.t0
+        self.cpu = self.cpu_seconds() - self.cpu0
+
+    @property
+    def rss_rise(self) -> int:
+        """Peak RSS (incl. children) above the baseline at __enter__"""
+        return max(self.peak_rss - self.baseline_rss, 0)
+
+    @property
+    def cpu_saturation(self) -> float:
+        """Fraction of all cores busy during the run"""
+        return self.cpu / (self.wall * (os.cpu_count() or 1)) if self.wall else 0.0
+
+
+def run_session(video_path, workspace, stages, motility_model, timings, errors, lock):
+    """
+    One analysis sample through the enabled stages; appends (stage, seconds)
+    """
+    job_dir = workspace.create_job("loadtest")
+    record = []
+    try:
+        t0 = time.perf_counter()
+        prep_path = prepare_video_pipeline(video_path, job_dir, keep_intermediates=False)
+        record.append(("prepare", time.perf_counter() - t0))
+
+        if "tracking" in stages:
+            from tracking.pipeline import tracking_pipeline
+            t0 = time.perf_counter()
+            tracks = tracking_pipeline(prep_path, os.path.join(job_dir, "tracks.csv"))
+            record.append(("tracking", time.perf_counter() - t0))
+
+            if "motility" in stages:
+                from models.motility_analyzer import run_motility_analysis
+                t0 = time.perf_counter()
+                run_motility_analysis(prep_path, tracks, motility_model)
+                record.append(("motility", time.perf_counter() - t0))
+
+            if "morphology" in stages:
+                from models.morphology_analyzer import run_morphology_analysis
+                t0 = time.perf_counter()
+                run_morphology_analysis(prep_path, tracks)
+                record.append(("morphology", time.perf_counter() - t0))
+
+        record.append(("total", sum(s for _, s in record)))
+        with lock:
+            timings.extend(record)
+    except Exception as e:
+        with lock:
+            errors.append(f"{type(e).__name__}: {e}")
+            traceback.print_exc()
+    finally:
+        workspace.release(job_dir)
+
+
+def run_level(video_path, concurrency, iterations, stages, motility_model, workspace) -> dict:
+    """
+    `concurrency` sessions in parallel, each running `iterations` samples back to back
+    """
+    timings, errors, lock = [], [], threading.Lock()
+
+    def session():
+        for _ in range(iterations):
+            run_session(video_path, workspace, stages, motility_model, timings, errors, lock)
+
+    with ResourceMonitor() as monitor:
+        threads = [threading.Thread(target=session) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    df = pd.DataFrame(timings, columns=["stage", "seconds"])
+    completed = int((df["stage"] == "total").sum())
+    row = {
+        "concurrency": concurrency,
+        "samples": completed,
+        "errors": len(errors),
+        "wall_s": monitor.wall,
+        "throughput_per_min": 60 * completed / monitor.wall if monitor.wall else 0.0,
+        "rss_rise_mb": monitor.rss_rise / 1024 ** 2,
+        "peak_rss_mb": monitor.peak_rss / 1024 ** 2,
+        "cpu_saturation": monitor.cpu_saturation,
+    }
+    for stage, group in df.groupby("stage"):
+        p50, p95, p99 = np.percentile(group["seconds"], [50, 95, 99])
+        row.update({f"{stage}_p50": p50, f"{stage}_p95": p95, f"{stage}_p99": p99})
+    return row
+
+
+def available_stages(requested, motility_model) -> list:
+    stages = list(requested)
+    if "motility" in stages and not (motility_model and os.path.exists(motility_model)):
+        print(f"Skipping motility: model not found ({motility_model})")
+        stages.remove("motility")
+    if "morphology" in stages and not os.environ.get("SPERMTRACK_MORPHOLOGY_MODEL") \
+            and os.environ.get("HF_HUB_OFFLINE") != "1":
+        print("Skipping morphology: set SPERMTRACK_MORPHOLOGY_MODEL (or HF_HUB_OFFLINE=1 with a cached model)")
+        stages.remove("morphology")
+    return stages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", nargs="?", help="Local input video (omit with --synthetic)")
+    parser.add_argument("--synthetic", action="store_true", help="Generate a synthetic input video")
+    parser.add_argument("--synthetic-seconds", type=float, default=3.0)
+    parser.add_argument("--concurrency", default="1,2,4", help="Comma-separated session counts")
+    parser.add_argument("--iterations", type=int, default=2, help="Samples per session")
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--motility-model", default="model_motility.h5")
+    parser.add_argument("--output", default=None, help="Write the capacity curve to CSV")
+    args = parser.parse_args()
+
+    if not args.video and not args.synthetic:
+        parser.error("give a video path or --synthetic")
+
+    import trackpy as tp
+    tp.quiet()  # log per-frame link_df membanjiri output
+
+    stages = available_stages([s.strip() for s in args.stages.split(",")], args.motility_model)
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video = args.video or make_synthetic_video(
+            os.path.join(tmp, "synthetic.mp4"), seconds=args.synthetic_seconds
+        )
+        workspace = Workspace(root=os.path.join(tmp, "jobs"))
+
+        # Satu sample pemanasan (import, kompilasi numba, load model) tidak ikut diukur
+        print(f"Stages: {', '.join(stages)}; warming up...")
+        run_level(video, 1, 1, stages, args.motility_model, workspace)
+
+        rows = []
+        for n in levels:
+            print(f"Running {n} concurrent session(s) x {args.iterations} sample(s)...")
+            rows.append(run_level(video, n, args.iterations, stages, args.motility_model, workspace))
+
+    curve = pd.DataFrame(rows)
+    summary_cols = ["concurrency", "samples", "errors", "throughput_per_min",
+                    "total_p50", "total_p95", "total_p99", "rss_rise_mb", "peak_rss_mb", "cpu_saturation"]
+    print("\nCapacity curve")
+    print(curve[[c for c in summary_cols if c in curve.columns]].to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+
+    print("\nPer-stage latency (s)")
+    stage_cols = [c for c in curve.columns if c.split("_")[0] in stages and c != "concurrency"]
+    print(curve[["concurrency", *stage_cols]].to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+
+    if args.output:
+        curve.to_csv(args.output, index=False)
+        print(f"\nSaved to {args.output}")
@@ -0,0 +1,73 @@
+"""
+First-sample vs steady-state detection + linking latency, with and
+without the numba warm-up and on-disk JIT cache (tracking/warmup.py).
+
+    python -m benchmarks.numba_warmup temp/videos/step3_contrast.mp4
+
+Every scenario runs in a fresh interpreter. The cache directory starts
+empty and is shared by the later scenarios to simulate a restart.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+_PROBE = """
+import json, time
+t0 = time.perf_counter()
+import trackpy as tp
+tp.quiet()
+from tracking.warmup import warmup_tracking
+from tracking.batch import batch_detect_sperm
+from tracking.linking import link_and_filter_tracks
+import_s = time.perf_counter() - t0
+
+warmup_s = warmup_tracking() if {warmup!r} else 0.0
+
+def sample():
+    t = time.perf_counter()
+    link_and_filter_tracks(batch_detect_sperm({video!r}))
+    return time.perf_counter() - t
+
+first = sample()
+steady = min(sample() for _ in range({repeat!r}))
+print(json.dumps({{'import_s': import_s, 'warmup_s': warmup_s, 'first_sample_s': first, 'steady_s': steady}}))
+"""
+
+SCENARIOS = [
+    ("no cache, no warm-up", "fresh", False),
+    ("warm-up, empty cache", "shared", True),
+    ("disk cache (restart)", "shared", False),
+    ("disk cache + warm-up", "shared", True),
+]
+
+
+def run_scenario(video, cache_dir, warmup, repeat):
+    env = dict(os.environ, SPERMTRACK_NUMBA_CACHE_DIR=cache_dir, NUMBA_CACHE_DIR=cache_dir)
+    code = _PROBE.format(video=video, warmup=warmup, repeat=repeat)
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", help="Prepared (contrast-stretched) video")
+    parser.add_argument("--repeat", type=int, default=2, help="Steady-state runs (min is reported)")
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        shared = os.path.join(tmp, "shared")
+        for name, cache, warmup in SCENARIOS:
+            cache_dir = os.path.join(tmp, f"fresh_{len(rows)}") if cache == "fresh" else shared
+            rows.append({'scenario': name, **run_scenario(args.video, cache_dir, warmup, args.repeat)})
+
+    df = pd.DataFrame(rows).set_index('scenario')
+    df['first_overhead_s'] = df['first_sample_s'] - df['steady_s']
+    print(df.to_string(float_format=lambda v: f"{v:.2f}"))
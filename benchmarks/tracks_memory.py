@@ -0,0 +1,48 @@
+"""
+Memory report for the tracks table: full tp.batch columns vs compact schema.
+
+    python -m benchmarks.tracks_memory temp/outputs/final_tracks.csv --repeat 100
+
+--repeat tiles the table along the frame axis to simulate a long recording.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from tracking.schema import compact_detections, compact_tracks, memory_report
+
+
+def tile_tracks(tracks: pd.DataFrame, repeat: int) -> pd.DataFrame:
+    n_frames = int(tracks["frame"].max()) + 1
+    n_particles = int(tracks["particle"].max()) + 1
+    tiles = []
+    for i in range(repeat):
+        t = tracks.copy()
+        t["frame"] += i * n_frames
+        t["particle"] += i * n_particles
+        tiles.append(t)
+    return pd.concat(tiles, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tracks_csv")
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    # Default pandas dtypes = apa yang dihasilkan tp.batch / tp.link_df (float64, int64)
+    tracks = pd.read_csv(args.tracks_csv).astype({"frame": np.int64, "particle": np.int64})
+    tracks = tile_tracks(tracks, args.repeat)
+    detections = tracks.drop(columns="particle")
+
+    print(f"{tracks['frame'].max() + 1} frames, {tracks['particle'].nunique()} particles\n")
+    print(memory_report(
+        detections_full=detections,
+        detections_compact=compact_detections(detections),
+    ).to_string(index=False))
+    print()
+    print(memory_report(
+        tracks_full=tracks,
+        tracks_compact=compact_tracks(tracks),
+    ).to_string(index=False))
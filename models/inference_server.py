@@ -0,0 +1,416 @@
+"""
+Local inference service shared by all Streamlit sessions and batch jobs.
+
+Hosts the motility and morphology models once in a separate process and
+merges concurrent predict requests into dynamic batches:
+
+    python -m models.inference_server --motility-model model_motility.h5
+
+Clients connect over a Unix socket (or host:port) and get a model proxy
+with the same .predict() as a Keras model:
+
+    client = InferenceClient()
+    preds = client.model("motility").predict(clips)
+
+Set SPERMTRACK_INFERENCE_ADDRESS to make run_motility_analysis and
+run_morphology_analysis use the server instead of loading Keras locally.
+
+The protocol is pickle, so only the local user may connect: the default
+Unix socket lives in a per-user 0700 directory, TCP is loopback-only, and
+the authkey comes from SPERMTRACK_INFERENCE_AUTHKEY or a random 0600 key
+file that server and clients share.
+"""
+import os
+import stat
+import queue
+import secrets
+import ipaddress
+import threading
+import time
+import argparse
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+# Direktori per-user (0700) untuk socket dan authkey, bukan /tmp bersama
+RUNTIME_DIR = os.environ.get(
+    "SPERMTRACK_RUNTIME_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "spermtrack", "run")
+)
+DEFAULT_ADDRESS = os.path.join(RUNTIME_DIR, "inference.sock")
+AUTHKEY_FILE = os.path.join(RUNTIME_DIR, "inference.key")
+LOOPBACK_HOSTS = {"localhost"}
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_LATENCY_MS = 10.0
+
+
+def ensure_runtime_dir(path: str = RUNTIME_DIR) -> str:
+    """
+    Create the runtime directory with mode 0700; refuse one owned by
+    another user or readable by group/others
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.stat(path)
+    if st.st_uid != os.getuid():
+        raise PermissionError(f"Runtime dir not owned by current user: {path}")
+    if stat.S_IMODE(st.st_mode) & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+
+def load_authkey() -> bytes:
+    """
+    SPERMTRACK_INFERENCE_AUTHKEY, else a random key in AUTHKEY_FILE (0600),
+    created by whichever side starts first
+    """
+    key = os.environ.get("SPERMTRACK_INFERENCE_AUTHKEY")
+    if key:
+        return key.encode()
+
+    ensure_runtime_dir(os.path.dirname(AUTHKEY_FILE))
+    try:
+        fd = os.open(AUTHKEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+
+    st = os.stat(AUTHKEY_FILE)
+    if st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) & 0o077:
+        raise PermissionError(f"Authkey file must be owned by this user with mode 0600: {AUTHKEY_FILE}")
+    with open(AUTHKEY_FILE) as f:
+        return f.read().strip().encode()
+
+
+def _is_loopback(host: str) -> bool:
+    if host in LOOPBACK_HOSTS:
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def parse_address(address: str):
+    """
+    "host:port" -> (host, port) untuk TCP (loopback saja), selain itu path Unix socket
+    """
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        host = host.strip("[]") or "127.0.0.1"
+        if not _is_loopback(host):
+            # Protokol pickle: koneksi dari host lain = eksekusi kode jarak jauh
+            raise ValueError(f"Inference server only binds/connects to loopback, got {host!r}")
+        return (host, int(port))
+    return address
+
+
+class _Request:
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ModelBatcher:
+    """
+    Single worker thread per model. Waits for the first request, then keeps
+    collecting until max_batch rows are queued or max_latency_ms has passed
+    since that first request, and runs one predict for the merged batch.
+    """
+
+    def __init__(self, name, model, max_batch=DEFAULT_MAX_BATCH, max_latency_ms=DEFAULT_MAX_LATENCY_MS):
+        self.name = name
+        self.model = model
+        self.max_batch = max_batch
+        self.max_latency = max_latency_ms / 1000.0
+        self.queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'rows': 0, 'batches': 0, 'max_batch_rows': 0, 'predict_seconds': 0.0}
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def predict(self, inputs):
+        request = _Request(np.asarray(inputs))
+        self.queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        rows = len(batch[0].inputs)
+        deadline = time.monotonic() + self.max_latency
+        while rows < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            rows += len(request.inputs)
+        return batch, rows
+
+    def _run(self):
+        while True:
+            batch, rows = self._collect()
+            t0 = time.perf_counter()
+            try:
+                # Request besar tetap satu request, tapi forward pass dipotong per max_batch
+                merged = np.concatenate([r.inputs for r in batch])
+                preds = self.model.predict(merged, batch_size=max(min(rows, self.max_batch), 1), verbose=0)
+                offset = 0
+                for r in batch:
+                    r.result = preds[offset: offset + len(r.inputs)]
+                    offset += len(r.inputs)
+            except Exception as exc:
+                for r in batch:
+                    r.error = exc
+            elapsed = time.perf_counter() - t0
+
+            with self._lock:
+                self._stats['requests'] += len(batch)
+                self._stats['rows'] += rows
+                self._stats['batches'] += 1
+                self._stats['max_batch_rows'] = max(self._stats['max_batch_rows'], rows)
+                self._stats['predict_seconds'] += elapsed
+            for r in batch:
+                r.done.set()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self.queue.qsize()
+        stats['mean_batch_rows'] = stats['rows'] / stats['batches'] if stats['batches'] else 0.0
+        stats['mean_requests_per_batch'] = stats['requests'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+
+class InferenceServer:
+    """
+    Listener + one thread per client connection; predicts go through the
+    per-model ModelBatcher so concurrent sessions share batches.
+
+    Messages are tuples: ('predict', model_name, array) -> ('ok', preds),
+    ('models',) -> ('ok', [model_name, ...]),
+    ('metrics',) -> ('ok', {model_name: stats}); failures -> ('error', message).
+    """
+
+    def __init__(self, models: dict, address=DEFAULT_ADDRESS, authkey=None,
+                 max_batch=DEFAULT_MAX_BATCH, max_latency_ms=DEFAULT_MAX_LATENCY_MS):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.authkey = authkey or load_authkey()
+        self.batchers = {
+            name: ModelBatcher(name, model, max_batch, max_latency_ms)
+            for name, model in models.items()
+        }
+
+    def metrics(self) -> dict:
+        return {name: b.metrics() for name, b in self.batchers.items()}
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if message[0] == 'predict':
+                        _, name, inputs = message
+                        if name not in self.batchers:
+                            raise KeyError(f"Model not loaded on server: {name}")
+                        reply = ('ok', self.batchers[name].predict(inputs))
+                    elif message[0] == 'models':
+                        reply = ('ok', sorted(self.batchers))
+                    elif message[0] == 'metrics':
+                        reply = ('ok', self.metrics())
+                    else:
+                        raise ValueError(f"Unknown request: {message[0]}")
+                except Exception as exc:
+                    reply = ('error', f"{type(exc).__name__}: {exc}")
+                conn.send(reply)
+
+    def serve_forever(self):
+        if isinstance(self.address, str):
+            socket_dir = os.path.dirname(os.path.abspath(self.address))
+            if socket_dir == os.path.abspath(RUNTIME_DIR):
+                ensure_runtime_dir(socket_dir)
+            # Hanya socket sisa server sebelumnya yang dihapus, bukan file lain
+            if os.path.lexists(self.address):
+                if not stat.S_ISSOCK(os.lstat(self.address).st_mode):
+                    raise FileExistsError(f"Address exists and is not a socket: {self.address}")
+                os.remove(self.address)
+        with Listener(self.address, authkey=self.authkey) as listener:
+            print(f"Inference server listening on {listener.address} (models: {', '.join(self.batchers)})")
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError) as exc:
+                    # Handshake gagal (authkey salah / client putus) tidak menghentikan server
+                    print(f"Rejected connection: {exc}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+
+class RemoteModel:
+    """
+    Drop-in for a Keras model: only .predict() is forwarded to the server
+    """
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def predict(self, inputs, **kwargs):
+        # batch_size/verbose diatur oleh server
+        return self.client._call('predict', self.name, np.ascontiguousarray(inputs))
+
+
+class InferenceClient:
+    """
+    Safe to share between threads: every thread gets its own connection,
+    so concurrent sessions reach the server in parallel and can be merged
+    into one batch instead of queueing behind a shared socket.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.authkey = authkey or load_authkey()
+        self._models = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conns = []
+        self._connection()  # gagal cepat jika server tidak bisa dihubungi
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = Client(self.address, authkey=self.authkey)
+            self._local.conn = conn
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            with self._lock:
+                if conn in self._conns:
+                    self._conns.remove(conn)
+            conn.close()
+
+    def _call(self, *message):
+        try:
+            conn = self._connection()
+            conn.send(message)
+            status, payload = conn.recv()
+        except (OSError, EOFError):
+            # Server mati/restart: buang koneksi ini dan client default
+            self._drop_connection()
+            _reset_default_client(self)
+            raise
+        if status == 'error':
+            raise RuntimeError(f"Inference server: {payload}")
+        return payload
+
+    def model(self, name: str) -> RemoteModel:
+        return RemoteModel(self, name)
+
+    def hosts(self, name: str) -> bool:
+        """True if the server has this model loaded (list fetched once)"""
+        if self._models is None:
+            self._models = set(self._call('models'))
+        return name in self._models
+
+    def metrics(self) -> dict:
+        return self._call('metrics')
+
+    def close(self):
+        with self._lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            conn.close()
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def _reset_default_client(client):
+    global _default_client
+    with _default_lock:
+        if _default_client is client:
+            _default_client = None
+    client.close()
+
+
+def get_default_client():
+    """
+    Shared client for SPERMTRACK_INFERENCE_ADDRESS, or None if unset or
+    the server is not reachable (analyzers then load Keras locally).
+    A client whose server went away is dropped and reconnected on the next call.
+    """
+    global _default_client
+    address = os.environ.get("SPERMTRACK_INFERENCE_ADDRESS")
+    if not address:
+        return None
+    with _default_lock:
+        if _default_client is None:
+            try:
+                _default_client = InferenceClient(address)
+            except (OSError, ValueError, AuthenticationError) as e:
+                print(f"Inference server tidak tersedia ({address}): {e}")
+                return None
+        return _default_client
+
+
+def remote_model(name: str, client=None):
+    """
+    RemoteModel for `name` if the server (client, default get_default_client)
+    hosts it, else None so the caller loads the model locally
+    """
+    client = client or get_default_client()
+    if client is None:
+        return None
+    try:
+        if client.hosts(name):
+            return client.model(name)
+    except (OSError, EOFError) as e:
+        print(f"Inference server tidak tersedia: {e}")
+        return None
+    print(f"Model '{name}' tidak dimuat di inference server, memakai model lokal")
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SpermTrack shared inference server")
+    parser.add_argument("--address", default=os.environ.get("SPERMTRACK_INFERENCE_ADDRESS", DEFAULT_ADDRESS),
+                        help="Unix socket path or loopback host:port")
+    parser.add_argument("--motility-model", default="model_motility.h5")
+    parser.add_argument("--no-morphology", action="store_true", help="Do not download/host the morphology model")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--max-latency-ms", type=float, default=DEFAULT_MAX_LATENCY_MS)
+    args = parser.parse_args()
+
+    from tensorflow.keras.models import load_model
+    from models.morphology_analyzer import load_morphology_model_hf
+
+    models = {'motility': load_model(args.motility_model)}
+    if not args.no_morphology:
+        morphology = load_morphology_model_hf()
+        if morphology is not None:
+            models['morphology'] = morphology
+        else:
+            print("Model morphology tidak dimuat; client akan memakai model lokal")
+
+    InferenceServer(
+        models, args.address, max_batch=args.max_batch, max_latency_ms=args.max_latency_ms
+    ).serve_forever()
@@ -1,9 +1,11 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 import numpy as np
 import pandas as pd
-import tensorflow as tf
-from tensorflow.keras.models import load_model
-from huggingface_hub import hf_hub_download # Tambahkan ini
+
+from models.inference_server import remote_model
 
 # Parameter sesuai training
 RESIZE_TO = 224
@@ -13,8 +15,13 @@ KERNEL_ERODE = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3,3))
 
 def load_morphology_model_hf():
     """Mengunduh model dari Hugging Face jika belum ada di cache"""
+    # Import berat (TensorFlow, huggingface_hub) baru saat model dibutuhkan
+    from tensorflow.keras.models import load_model
+    from huggingface_hub import hf_hub_download
+
     try:
-        model_path = hf_hub_download(
+        # SPERMTRACK_MORPHOLOGY_MODEL: file .h5 lokal (mode offline / load test)
+        model_path = os.environ.get("SPERMTRACK_MORPHOLOGY_MODEL") or hf_hub_download(
             repo_id="nashiffrd/SpermMorpho", 
             filename="model_morfologi.h5"
         )
@@ -25,8 +32,13 @@ def load_morphology_model_hf():
         print(f"Gagal mengunduh model dari Hugging Face: {e}")
         return None
 
+def nearest_center_label(centroids, w, h):
+    """Label komponen (selain background) yang centroid-nya paling dekat ke pusat crop"""
+    cx_img, cy_img = w // 2, h // 2
+    dist = np.sqrt((centroids[1:, 0] - cx_img)**2 + (centroids[1:, 1] - cy_img)**2)
+    return 1 + int(np.argmin(dist))
+
 def apply_binary_erosion(img_bgr):
-    # (Logika fungsi ini tetap sama seperti sebelumnya)
     gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
     binary = cv2.adaptiveThreshold(
         gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
@@ -39,18 +51,9 @@ def apply_binary_erosion(img_bgr):
     if num_labels <= 1: return 255 * np.ones((RESIZE_TO, RESIZE_TO, 3), dtype=np.uint8)
 
     h, w = gray.shape
-    cx_img, cy_img = w // 2, h // 2
-    min_dist = np.inf
-    target_label = 1
-    for i in range(1, num_labels):
-        cx, cy = centroids[i]
-        dist = np.sqrt((cx - cx_img)**2 + (cy - cy_img)**2)
-        if dist < min_dist:
-            min_dist = dist
-            target_label = i
+    target_label = nearest_center_label(centroids, w, h)
             
-    mask = np.zeros_like(binary)
-    mask[labels == target_label] = 255
+    mask = np.where(labels == target_label, 255, 0).astype(np.uint8)
     contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     filled = np.zeros_like(mask)
     cv2.drawContours(filled, contours, -1, 255, thickness=-1)
@@ -60,8 +63,33 @@ def apply_binary_erosion(img_bgr):
     final_bgr = cv2.cvtColor(final_gray, cv2.COLOR_GRAY2BGR)
     return final_bgr
 
-def run_morphology_analysis(video_path, tracks_df):
-    """Fungsi utama dengan penarikan model dari HF"""
+def _preprocess_crop(crop):
+    if crop.shape[:2] != (RESIZE_TO, RESIZE_TO):
+        crop = cv2.resize(crop, (RESIZE_TO, RESIZE_TO))
+    return apply_binary_erosion(crop)
+
+def preprocess_crops(crops, max_workers=None, normalize=True):
+    """
+    Resize + apply_binary_erosion untuk banyak crop sekaligus di thread pool
+    (OpenCV melepas GIL, jadi semua core terpakai).
+
+    Returns stacked array (N, RESIZE_TO, RESIZE_TO, 3):
+    float32 0-1 siap untuk model.predict jika normalize=True, selain itu uint8.
+    """
+    if len(crops) == 0:
+        dtype = np.float32 if normalize else np.uint8
+        return np.empty((0, RESIZE_TO, RESIZE_TO, 3), dtype=dtype)
+
+    max_workers = max_workers or os.cpu_count()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        processed = np.stack(list(pool.map(_preprocess_crop, crops)))
+
+    if normalize:
+        return processed.astype(np.float32) / 255.0
+    return processed
+
+def run_morphology_analysis(video_path, tracks_df, client=None):
+    """Fungsi utama dengan penarikan model dari HF (atau inference server jika ada client)"""
     # 1. Pilih frame terbaik
     best_frames = (
         tracks_df.sort_values("signal", ascending=False)
@@ -70,21 +98,25 @@ def run_morphology_analysis(video_path, tracks_df):
           .reset_index()
     )
     
-    # 2. Load Model dari Hugging Face
-    model = load_morphology_model_hf()
+    # 2. Load Model dari Hugging Face / inference server bersama
+    model = remote_model('morphology', client) or load_morphology_model_hf()
     if model is None:
         return pd.DataFrame()
 
+    # 3. Crop semua partikel (urut frame agar seek video maju terus)
     cap = cv2.VideoCapture(video_path)
-    results = []
+    crops, kept = [], []
+    frame, current_idx = None, None
 
-    for _, row in best_frames.iterrows():
-        p_id = row['particle']
+    for i in best_frames.sort_values('frame').index:
+        row = best_frames.loc[i]
         f_idx = int(row['frame'])
-        
-        cap.set(cv2.CAP_PROP_POS_FRAMES, f_idx)
-        ret, frame = cap.read()
-        if not ret: continue
+
+        if f_idx != current_idx:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, f_idx)
+            ret, frame = cap.read()
+            current_idx = f_idx if ret else None
+        if current_idx is None: continue
         
         # Cropping
         h, w = frame.shape[:2]
@@ -95,24 +127,32 @@ def run_morphology_analysis(video_path, tracks_df):
         crop = frame[y1:y2, x1:x2]
         
         if crop.size == 0: continue
-        crop_res = cv2.resize(crop, (RESIZE_TO, RESIZE_TO))
-        
-        # Preprocessing
-        processed_img = apply_binary_erosion(crop_res)
-        
-        # Predict
-        img_input = np.expand_dims(processed_img.astype(np.float32) / 255.0, axis=0)
-        prob = model.predict(img_input)[0][0]
+        crops.append(crop)
+        kept.append(i)
         
+    cap.release()
+    if not crops:
+        return pd.DataFrame()
+
+    # Kembalikan ke urutan partikel seperti semula
+    order = np.argsort(kept, kind='stable')
+    crops = [crops[j] for j in order]
+    kept = [kept[j] for j in order]
+
+    # 4. Preprocessing paralel + predict satu batch
+    processed = preprocess_crops(crops, normalize=False)
+    probs = model.predict(processed.astype(np.float32) / 255.0)[:, 0]
+
+    results = []
+    for i, prob, processed_img in zip(kept, probs, processed):
         label = "Abnormal" if prob < 0.5 else "Normal"
         conf_value = prob if prob > 0.5 else (1 - prob)
         results.append({
-            'particle': p_id,
+            'particle': best_frames.loc[i, 'particle'],
             'morphology_label': label,
             'morphology_prob': prob,
             'confidence': float(conf_value),
             'image_display': processed_img 
         })
         
-    cap.release()
     return pd.DataFrame(results)
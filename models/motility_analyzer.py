@@ -1,8 +1,9 @@
 import cv2
 import numpy as np
 import pandas as pd
-import tensorflow as tf
-from tensorflow.keras.models import load_model
+
+from video.frame_pipeline import FramePipeline
+from models.inference_server import remote_model
 
 # Konfigurasi sesuai training kamu
 CROP_SIZE = 64
@@ -31,79 +32,142 @@ def crop_frame_centered(frame, cx, cy, size=64):
         crop = cv2.resize(crop, (size, size))
     return crop
 
-def extract_particle_clips(video_path, tracks_df):
+def _clip_rows(tracks_df):
     """
-    Mengambil clips per partikel langsung ke memory (numpy array)
+    Baris yang masuk clip: FRAMES_PER_CLIP kemunculan pertama tiap partikel
     """
-    cap = cv2.VideoCapture(video_path)
-    particle_clips = {} # {particle_id: [frames]}
-    
-    # Ambil list partikel unik
-    unique_particles = tracks_df['particle'].unique()
-    
     # Sort tracks berdasarkan frame untuk pembacaan sekali jalan (efisien)
     tracks_df = tracks_df.sort_values('frame')
+    return tracks_df[tracks_df.groupby('particle').cumcount() < FRAMES_PER_CLIP]
+
+def _crop_stage(clip_rows):
+    """
+    Stage FramePipeline: crop uint8 untuk semua partikel di frame ini
+    """
+    pids = clip_rows['particle'].to_numpy()
+    xs = clip_rows['x'].to_numpy()
+    ys = clip_rows['y'].to_numpy()
+    rows_by_frame = clip_rows.groupby('frame').indices
     
-    frame_idx = 0
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret: break
-        
+    def crop_particles(frame_idx, frame):
         # Cari partikel yang muncul di frame ini
-        current_frame_data = tracks_df[tracks_df['frame'] == frame_idx]
-        
-        for _, row in current_frame_data.iterrows():
-            p_id = row['particle']
-            if p_id not in particle_clips:
-                particle_clips[p_id] = []
-            
-            # Stop jika sudah mencapai limit frames_per_clip
-            if len(particle_clips[p_id]) < FRAMES_PER_CLIP:
-                crop = crop_frame_centered(frame, row['x'], row['y'], CROP_SIZE)
-                # Normalize 0-1
-                particle_clips[p_id].append(crop.astype(np.float32) / 255.0)
-        
-        frame_idx += 1
-    cap.release()
+        return [
+            (pids[i], crop_frame_centered(frame, xs[i], ys[i], CROP_SIZE))
+            for i in rows_by_frame.get(frame_idx, ())
+        ]
+    return crop_particles
+
+def _finish_clip(frames):
+    # Padding dengan frame terakhir jika kurang dari FRAMES_PER_CLIP, lalu normalize 0-1
+    frames = frames + [frames[-1]] * (FRAMES_PER_CLIP - len(frames))
+    return np.array(frames).astype(np.float32) / 255.0 # Shape: (32, 64, 64, 3)
+
+def extract_particle_clips(video_path, tracks_df):
+    """
+    Mengambil clips per partikel langsung ke memory (numpy array)
+    """
+    particle_clips = {} # {particle_id: [frames]}
+    clip_rows = _clip_rows(tracks_df)
+    
+    # Decode dan crop per frame berjalan overlap di FramePipeline
+    for _, crops in FramePipeline(video_path, [_crop_stage(clip_rows)]):
+        for p_id, crop in crops:
+            particle_clips.setdefault(p_id, []).append(crop)
     
-    # Post-processing: Padding untuk partikel yang durasinya kurang dari 32 frame
     final_data = []
     particle_ids = []
     
     for p_id, frames in particle_clips.items():
         if len(frames) == 0: continue
-        
-        # Padding dengan frame terakhir jika kurang
-        while len(frames) < FRAMES_PER_CLIP:
-            frames.append(frames[-1])
-            
-        final_data.append(np.array(frames)) # Shape: (32, 64, 64, 3)
+        final_data.append(_finish_clip(frames))
         particle_ids.append(p_id)
         
     return np.array(final_data), particle_ids
 
-def run_motility_analysis(video_path, tracks_df, model_path):
+def stream_particle_clips(video_path, tracks_df):
     """
-    Fungsi utama yang dipanggil oleh app.py
+    Generator (particle_id, clip) yang langsung mengeluarkan clip begitu
+    partikel mencapai FRAMES_PER_CLIP frame atau lintasannya berakhir.
+    Hanya clip yang belum selesai yang disimpan (sebagai uint8).
     """
-    # 1. Extract Clips
-    clips, p_ids = extract_particle_clips(video_path, tracks_df)
+    clip_rows = _clip_rows(tracks_df)
+    
+    # Frame terakhir yang masuk clip = titik selesai tiap partikel
+    last_frames = clip_rows.groupby('particle')['frame'].max()
+    complete_at = last_frames.index.groupby(last_frames.to_numpy())
     
-    if len(clips) == 0:
-        return pd.DataFrame()
+    pending = {} # {particle_id: [frames]}
+    for frame_idx, crops in FramePipeline(video_path, [_crop_stage(clip_rows)]):
+        for p_id, crop in crops:
+            pending.setdefault(p_id, []).append(crop)
+        
+        for p_id in complete_at.get(frame_idx, ()):
+            frames = pending.pop(p_id, None)
+            if frames:
+                yield p_id, _finish_clip(frames)
+    
+    # Video habis sebelum lintasan selesai
+    for p_id, frames in pending.items():
+        yield p_id, _finish_clip(frames)
 
-    # 2. Load Model & Predict
-    model = load_model(model_path)
-    preds = model.predict(clips)
+def _format_results(p_ids, preds):
     pred_indices = np.argmax(preds, axis=1)
-    
-    # 3. Format Result
-    results = []
-    for i, p_id in enumerate(p_ids):
-        results.append({
+    return [
+        {
             'particle': p_id,
             'motility_label': LABEL_MAP[pred_indices[i]],
             'confidence': np.max(preds[i])
-        })
+        }
+        for i, p_id in enumerate(p_ids)
+    ]
+
+def run_motility_analysis(video_path, tracks_df, model_path, batch_size=32, streaming=True, client=None):
+    """
+    Fungsi utama yang dipanggil oleh app.py
+
+    streaming=True: clip dikirim ke batch inferensi begitu selesai, batch
+    dijalankan sementara decoding berlanjut, dan clip langsung dibuang
+    setelah diprediksi. Memori puncak bergantung pada batch_size, bukan
+    jumlah total partikel.
+
+    client: InferenceClient (models.inference_server); default dari
+    SPERMTRACK_INFERENCE_ADDRESS. Jika tidak ada server, atau server tidak
+    memuat model motility, model Keras dimuat lokal.
+    """
+    model = remote_model('motility', client)
+    if model is None:
+        # TensorFlow baru dimuat saat inferensi pertama, bukan saat import
+        from tensorflow.keras.models import load_model
+        model = load_model(model_path)
+
+    if not streaming:
+        # 1. Extract Clips
+        clips, p_ids = extract_particle_clips(video_path, tracks_df)
+        
+        if len(clips) == 0:
+            return pd.DataFrame()
+
+        # 2. Predict
+        preds = model.predict(clips)
         
+        # 3. Format Result
+        return pd.DataFrame(_format_results(p_ids, preds))
+
+    results = []
+    batch, batch_ids = [], []
+
+    def flush():
+        preds = model.predict(np.stack(batch), verbose=0)
+        results.extend(_format_results(batch_ids, preds))
+        batch.clear()
+        batch_ids.clear()
+
+    for p_id, clip in stream_particle_clips(video_path, tracks_df):
+        batch.append(clip)
+        batch_ids.append(p_id)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
     return pd.DataFrame(results)
@@ -0,0 +1,130 @@
+import collections
+
+import cv2
+import numpy as np
+
+from video.frame_pipeline import FramePipeline, VideoEncoder
+from .contrast import contrast_stretch
+
+# Sliding window ~5 detik pada 60 fps, sampel tiap 15 frame -> median dari 20 frame
+# (window pendek ikut menyerap sperma yang bergerak lambat ke background)
+DEFAULT_BG_WINDOW = 300
+DEFAULT_BG_STEP = 15
+# Median dihitung ulang tiap 60 frame (1 detik), bukan tiap sampel
+DEFAULT_BG_REFRESH = 60
+# Jumlah sampel untuk background global (dipakai menghitung objek statis)
+GLOBAL_BG_SAMPLES = 50
+
+
+def flatten_frame(frame: np.ndarray, background: np.ndarray, level: float) -> np.ndarray:
+    """
+    frame - background + level: objek statis & iluminasi tidak rata hilang,
+    polaritas (sperma gelap) tetap sama
+    """
+    flat = frame.astype(np.int16) - background.astype(np.int16) + int(round(level))
+    return np.clip(flat, 0, 255).astype(np.uint8)
+
+
+def subtract_background(
+    input_path: str,
+    output_path: str,
+    background_path: str = None,
+    window: int = DEFAULT_BG_WINDOW,
+    step: int = DEFAULT_BG_STEP,
+    refresh: int = DEFAULT_BG_REFRESH
+) -> np.ndarray:
+    """
+    Streaming background subtraction for a grayscale video.
+
+    The background is the running median of every `step`-th frame over
+    the last `window` frames, recomputed every `refresh` frames (the
+    first window is used for the first frames). Returns the global background (median over the whole video),
+    written to background_path if given, for counting static objects.
+    """
+    pipeline = FramePipeline(input_path)
+    n_samples = max(1, window // step)
+    global_stride = max(1, pipeline.frame_count // GLOBAL_BG_SAMPLES)
+
+    samples = collections.deque(maxlen=n_samples)
+    global_samples = []
+    pending = []  # frame sebelum buffer pertama penuh
+    background, level = None, 0.0
+
+    def update_background():
+        nonlocal background, level
+        background = np.median(np.stack(samples), axis=0).astype(np.uint8)
+        level = float(background.mean())
+
+    with VideoEncoder(output_path, "mp4v", pipeline.fps, (pipeline.width, pipeline.height), is_color=False) as out:
+        for frame_idx, frame in pipeline:
+            if frame.ndim == 3:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+            if frame_idx % global_stride == 0:
+                global_samples.append(frame)
+
+            if frame_idx % step == 0:
+                samples.append(frame)
+                if background is None and len(samples) == n_samples:
+                    update_background()
+            if background is not None and frame_idx % refresh == 0:
+                update_background()
+
+            if background is None:
+                pending.append(frame)
+                continue
+
+            for f in pending:
+                out.write(flatten_frame(f, background, level))
+            pending.clear()
+            out.write(flatten_frame(frame, background, level))
+
+        # Video lebih pendek dari satu window
+        if pending:
+            update_background()
+            for f in pending:
+                out.write(flatten_frame(f, background, level))
+
+    global_background = np.median(np.stack(global_samples), axis=0).astype(np.uint8)
+    if background_path is not None:
+        cv2.imwrite(background_path, global_background)
+    return global_background
+
+
+def count_static_objects(
+    background,
+    tracks_df=None,
+    diameter=21,
+    minmass=500,
+    separation=50,
+    noise_size=1
+) -> int:
+    """
+    Objects visible in the global background never move: dead/immotile
+    cells stuck to the slide (and debris). Uses the same detector settings
+    as batch_detect_sperm on the contrast-stretched background image.
+    Objects within one diameter of a track's mean position are already
+    counted by the motility model and are skipped.
+    """
+    # trackpy/numba hanya dimuat jika fitur ini dipakai
+    from tracking._trackpy import tp
+    from tracking.batch import DETECT_LOCATE_KWARGS
+
+    if isinstance(background, str):
+        background = cv2.imread(background, cv2.IMREAD_GRAYSCALE)
+
+    f = tp.locate(
+        contrast_stretch(background),
+        diameter=diameter,
+        minmass=minmass,
+        separation=separation,
+        noise_size=noise_size,
+        **DETECT_LOCATE_KWARGS
+    )
+    if tracks_df is None or f.empty or len(tracks_df) == 0:
+        return len(f)
+
+    centers = tracks_df.groupby('particle')[['x', 'y']].mean().to_numpy()
+    objects = f[['x', 'y']].to_numpy()
+    dist = np.linalg.norm(objects[:, None, :] - centers[None, :, :], axis=2)
+    return int((dist.min(axis=1) > diameter).sum())
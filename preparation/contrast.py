@@ -10,6 +10,8 @@ Original file is located at
 import cv2
 import numpy as np
 
+from video.frame_pipeline import transcode_video
+
 def contrast_stretch(img: np.ndarray) -> np.ndarray:
     p2, p98 = np.percentile(img, (2, 98))
     return np.clip(
@@ -30,22 +32,12 @@ def apply_contrast_stretching(
         raise IOError(f"Cannot open video: {input_path}")
 
     fps = int(cap.get(cv2.CAP_PROP_FPS))
-    w   = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    h   = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    out = cv2.VideoWriter(output_path, fourcc, fps, (w, h), isColor=False)
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    cap.release()
 
+    def enhance(frame_idx, frame):
         if frame.ndim == 3:
             frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return contrast_stretch(frame)
 
-        enhanced = contrast_stretch(frame)
-        out.write(enhanced)
-
-    cap.release()
-    out.release()
\ No newline at end of file
+    # decode, contrast stretch dan encode berjalan overlap
+    transcode_video(input_path, output_path, enhance, fourcc="mp4v", is_color=False, fps=fps)
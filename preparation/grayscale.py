@@ -9,6 +9,8 @@ Original file is located at
 
 import cv2
 
+from video.frame_pipeline import transcode_video
+
 def convert_video_to_grayscale(
     input_path: str,
     output_path: str
@@ -16,24 +18,7 @@ def convert_video_to_grayscale(
     """
     Convert RGB video to grayscale video
     """
-    cap = cv2.VideoCapture(input_path)
-    if not cap.isOpened():
-        raise IOError(f"Cannot open video: {input_path}")
-
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    w   = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    h   = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_path, fourcc, fps, (w, h), isColor=False)
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        out.write(gray)
+    def to_gray(frame_idx, frame):
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
-    cap.release()
-    out.release()
\ No newline at end of file
+    transcode_video(input_path, output_path, to_gray, fourcc="mp4v", is_color=False)
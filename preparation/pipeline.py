@@ -11,17 +11,25 @@ import os
 from .video_normalization import normalize_video
 from .grayscale import convert_video_to_grayscale
 from .contrast import apply_contrast_stretching
+from .background import subtract_background
 
 
 def prepare_video_pipeline(
     input_video_path: str,
-    working_dir: str
+    working_dir: str,
+    start: float = None,
+    duration: float = None,
+    keep_intermediates: bool = True,
+    subtract_bg: bool = False
 ) -> str:
     """
     Full video preparation pipeline:
-    1. Normalize FPS & size
+    1. Normalize FPS & size (optionally only [start, start + duration) seconds)
     2. Convert to grayscale
-    3. Apply contrast stretching
+    3. (optional) Subtract the running-median background; the global
+       background is saved as background.png for count_static_objects
+    4. Apply contrast stretching
+    Intermediate videos are deleted afterwards if keep_intermediates is False
 
     Returns:
     - path to final prepared video
@@ -31,10 +39,20 @@ def prepare_video_pipeline(
 
     step1 = os.path.join(working_dir, "step1_normalized.mp4")
     step2 = os.path.join(working_dir, "step2_grayscale.mp4")
+    step2b = os.path.join(working_dir, "step2b_background.mp4")
     step3 = os.path.join(working_dir, "step3_contrast.mp4")
 
-    normalize_video(input_video_path, step1)
+    normalize_video(input_video_path, step1, start=start, duration=duration)
     convert_video_to_grayscale(step1, step2)
-    apply_contrast_stretching(step2, step3)
+    if subtract_bg:
+        subtract_background(step2, step2b, os.path.join(working_dir, "background.png"))
+        apply_contrast_stretching(step2b, step3)
+    else:
+        apply_contrast_stretching(step2, step3)
+
+    if not keep_intermediates:
+        for path in (step1, step2, step2b):
+            if os.path.exists(path):
+                os.remove(path)
 
     return step3
\ No newline at end of file
@@ -0,0 +1,157 @@
+import cv2
+import numpy as np
+
+from .contrast import contrast_stretch
+from .video_normalization import TARGET_FPS, TARGET_SIZE
+
+# Jumlah frame sampel (dibaca lewat seek index container, bukan decode penuh)
+QC_SAMPLE_FRAMES = 6
+
+# Ambang batas (dikalibrasi pada frame 512x512 hasil resize, seperti normalisasi)
+QC_THRESHOLDS = {
+    # Laplacian variance: rekaman tajam ~60-80, blur berat < 1
+    'focus':            {'warn': 20.0, 'fail': 5.0},
+    # Mean brightness 0-255 (terlalu gelap / terlalu terang)
+    'brightness_low':   {'warn': 50.0, 'fail': 20.0},
+    'brightness_high':  {'warn': 220.0, 'fail': 240.0},
+    # Fraksi piksel saturasi (>= 250)
+    'saturated':        {'warn': 0.02, 'fail': 0.20},
+    # Estimasi sigma noise (Immerkaer)
+    'noise':            {'warn': 8.0, 'fail': 20.0},
+    'fps':              {'warn': 30.0, 'fail': 15.0},
+    # Durasi minimum: clip motility & filter_stubs butuh >= 32 frame pada TARGET_FPS
+    'duration':         {'warn': 2.0, 'fail': 0.6},
+    # Rata-rata deteksi per frame
+    'density':          {'warn': 5.0, 'fail': 1.0},
+}
+
+_NOISE_KERNEL = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+_STATUS_ORDER = {'pass': 0, 'warn': 1, 'fail': 2}
+
+
+def estimate_noise(gray: np.ndarray) -> float:
+    """
+    Immerkaer fast noise variance estimate (sigma, grey levels)
+    """
+    h, w = gray.shape
+    response = np.abs(cv2.filter2D(gray.astype(np.float32), -1, _NOISE_KERNEL))[1:-1, 1:-1]
+    return float(response.sum() * np.sqrt(np.pi / 2) / (6 * (w - 2) * (h - 2)))
+
+
+def read_sample_frames(video_path: str, n_frames=QC_SAMPLE_FRAMES):
+    """
+    Evenly spaced grayscale frames (resized like normalize_video) plus
+    container metadata; seeks by frame index instead of decoding everything
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video: {video_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    size = tuple(int(v) for v in TARGET_SIZE.split(":"))
+
+    frames = []
+    for idx in np.linspace(0, max(frame_count - 1, 0), n_frames).astype(int):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        frames.append(cv2.resize(gray, size, interpolation=cv2.INTER_AREA))
+    cap.release()
+
+    meta = {'fps': fps, 'frame_count': frame_count, 'duration': frame_count / fps if fps > 0 else 0.0}
+    return frames, meta
+
+
+def _grade_low(value, limits):
+    # Nilai kecil = buruk
+    if value < limits['fail']:
+        return 'fail'
+    return 'warn' if value < limits['warn'] else 'pass'
+
+
+def _grade_high(value, limits):
+    # Nilai besar = buruk
+    if value > limits['fail']:
+        return 'fail'
+    return 'warn' if value > limits['warn'] else 'pass'
+
+
+def count_detections(gray, diameter=21, minmass=500, separation=50, noise_size=1) -> int:
+    """
+    tp.locate on one contrast-stretched frame with batch_detect_sperm's settings
+    """
+    p2, p98 = np.percentile(gray, (2, 98))
+    if p98 <= p2:
+        return 0  # frame rata, tidak ada yang bisa dideteksi
+
+    # trackpy/numba hanya dimuat saat QC pertama jalan; kernel diambil dari cache disk
+    from tracking._trackpy import tp
+    from tracking.batch import DETECT_LOCATE_KWARGS
+
+    f = tp.locate(
+        contrast_stretch(gray),
+        diameter=diameter,
+        minmass=minmass,
+        separation=separation,
+        noise_size=noise_size,
+        **DETECT_LOCATE_KWARGS
+    )
+    return len(f)
+
+
+def run_quality_check(video_path: str, detect_params: dict = None, n_frames=QC_SAMPLE_FRAMES) -> dict:
+    """
+    Quick input QC on a few sampled frames: focus, exposure, noise,
+    fps/duration and rough detection density.
+
+    Returns dict with 'verdict' ('pass' | 'warn' | 'fail'), 'checks'
+    (list of {check, value, status, message}) and 'metrics'.
+    """
+    frames, meta = read_sample_frames(video_path, n_frames)
+    checks = []
+
+    def add(check, value, status, message):
+        checks.append({'check': check, 'value': round(float(value), 3), 'status': status, 'message': message})
+
+    add('fps', meta['fps'], _grade_low(meta['fps'], QC_THRESHOLDS['fps']),
+        f"{meta['fps']:.1f} fps (pipeline menormalisasi ke {TARGET_FPS} fps)")
+    add('duration', meta['duration'], _grade_low(meta['duration'], QC_THRESHOLDS['duration']),
+        f"Durasi {meta['duration']:.1f} detik")
+
+    if not frames:
+        add('frames', 0, 'fail', "Frame video tidak dapat dibaca")
+        return {'verdict': 'fail', 'checks': checks, 'metrics': meta}
+
+    focus = float(np.median([cv2.Laplacian(g, cv2.CV_64F).var() for g in frames]))
+    brightness = float(np.median([g.mean() for g in frames]))
+    saturated = float(np.median([(g >= 250).mean() for g in frames]))
+    noise = float(np.median([estimate_noise(g) for g in frames]))
+
+    add('focus', focus, _grade_low(focus, QC_THRESHOLDS['focus']),
+        "Fokus (Laplacian variance); nilai rendah = gambar blur")
+
+    exposure_status = max(
+        _grade_low(brightness, QC_THRESHOLDS['brightness_low']),
+        _grade_high(brightness, QC_THRESHOLDS['brightness_high']),
+        key=_STATUS_ORDER.get
+    )
+    add('brightness', brightness, exposure_status, "Rata-rata kecerahan (0-255)")
+    add('saturated', saturated, _grade_high(saturated, QC_THRESHOLDS['saturated']),
+        "Fraksi piksel overexposed")
+    add('noise', noise, _grade_high(noise, QC_THRESHOLDS['noise']), "Estimasi sigma noise")
+
+    # Density hanya berarti jika gambar cukup tajam & terekspos
+    if all(c['status'] != 'fail' for c in checks):
+        density = float(np.mean([count_detections(g, **(detect_params or {})) for g in frames]))
+        add('density', density, _grade_low(density, QC_THRESHOLDS['density']),
+            "Rata-rata deteksi per frame (parameter locate saat ini)")
+    else:
+        density = None
+
+    verdict = max((c['status'] for c in checks), key=_STATUS_ORDER.get)
+    metrics = {**meta, 'focus': focus, 'brightness': brightness, 'saturated': saturated,
+               'noise': noise, 'density': density}
+    return {'verdict': verdict, 'checks': checks, 'metrics': metrics}
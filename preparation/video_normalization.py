@@ -16,16 +16,22 @@ def normalize_video(
     input_path: str,
     output_path: str,
     fps: int = TARGET_FPS,
-    size: str = TARGET_SIZE
+    size: str = TARGET_SIZE,
+    start: float = None,
+    duration: float = None
 ):
     """
     Normalize video FPS and resolution using ffmpeg
+    Optional start/duration (seconds) cut a window out of the input
     Output still in video format
     """
-    command = [
-        "ffmpeg",
-        "-y",
-        "-i", input_path,
+    command = ["ffmpeg", "-y"]
+    if start is not None:
+        command += ["-ss", f"{start:.3f}"]
+    command += ["-i", input_path]
+    if duration is not None:
+        command += ["-t", f"{duration:.3f}"]
+    command += [
         "-r", str(fps),
         "-vf", f"scale={size}",
         "-c:v", "libx264",
@@ -0,0 +1,353 @@
+import os
+import sqlite3
+import uuid
+import argparse
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from analysis.summary import summarize_results
+
+DEFAULT_DB_PATH = os.environ.get(
+    "SPERMTRACK_DB",
+    os.path.join("results", "spermtrack.db")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    sample_id             TEXT PRIMARY KEY,
+    patient_id            TEXT,
+    video_name            TEXT,
+    analyzed_at           TEXT NOT NULL,
+    analyzed_month        TEXT NOT NULL,
+    diagnosis             TEXT NOT NULL,
+    total_motility        INTEGER NOT NULL,
+    pr_count              INTEGER NOT NULL,
+    np_count              INTEGER NOT NULL,
+    im_count              INTEGER NOT NULL,
+    static_im_count       INTEGER NOT NULL DEFAULT 0,
+    total_morphology      INTEGER NOT NULL,
+    normal_count          INTEGER NOT NULL,
+    abnormal_count        INTEGER NOT NULL,
+    pr_percent            REAL NOT NULL,
+    normal_percent        REAL NOT NULL,
+    motility_confidence   REAL,
+    morphology_confidence REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_samples_analyzed_at
+    ON samples (analyzed_at);
+CREATE INDEX IF NOT EXISTS idx_samples_diagnosis
+    ON samples (diagnosis, analyzed_at);
+CREATE INDEX IF NOT EXISTS idx_samples_patient
+    ON samples (patient_id, analyzed_at);
+-- covering index: distribusi PR% bulanan tanpa membaca tabel utama
+CREATE INDEX IF NOT EXISTS idx_samples_month_pr
+    ON samples (analyzed_month, pr_percent);
+
+CREATE TABLE IF NOT EXISTS particles (
+    sample_id             TEXT NOT NULL REFERENCES samples (sample_id) ON DELETE CASCADE,
+    particle              INTEGER NOT NULL,
+    window                INTEGER,
+    motility_label        TEXT,
+    motility_confidence   REAL,
+    morphology_label      TEXT,
+    morphology_confidence REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_particles_sample
+    ON particles (sample_id);
+
+CREATE TABLE IF NOT EXISTS stage_timings (
+    sample_id TEXT NOT NULL REFERENCES samples (sample_id) ON DELETE CASCADE,
+    stage     TEXT NOT NULL,
+    seconds   REAL NOT NULL,
+    PRIMARY KEY (sample_id, stage)
+) WITHOUT ROWID;
+"""
+
+SAMPLE_COLUMNS = [
+    'sample_id', 'patient_id', 'video_name', 'analyzed_at', 'analyzed_month',
+    'diagnosis', 'total_motility', 'pr_count', 'np_count', 'im_count',
+    'static_im_count', 'total_morphology', 'normal_count', 'abnormal_count',
+    'pr_percent', 'normal_percent', 'motility_confidence', 'morphology_confidence'
+]
+
+
+def _particle_rows(sample_id, motility_results, morphology_results):
+    """
+    One row per particle with both labels and confidences.
+    Multi-window results are keyed by (window, particle).
+    """
+    keys = ['window', 'particle'] if 'window' in motility_results.columns else ['particle']
+    frames = []
+    if len(motility_results):
+        frames.append(
+            motility_results[[*keys, 'motility_label', 'confidence']]
+            .rename(columns={'confidence': 'motility_confidence'})
+            .set_index(keys)
+        )
+    if len(morphology_results):
+        frames.append(
+            morphology_results[[*keys, 'morphology_label', 'confidence']]
+            .rename(columns={'confidence': 'morphology_confidence'})
+            .set_index(keys)
+        )
+    if not frames:
+        return []
+
+    merged = pd.concat(frames, axis=1, join='outer')
+    merged = merged.reindex(columns=[
+        'motility_label', 'motility_confidence',
+        'morphology_label', 'morphology_confidence'
+    ])
+    merged = merged.astype(object).where(merged.notna(), None)
+
+    rows = []
+    for key, m_label, m_conf, mo_label, mo_conf in merged.itertuples(name=None):
+        window, pid = key if len(keys) == 2 else (None, key)
+        rows.append((
+            sample_id, int(pid),
+            None if window is None else int(window),
+            m_label,
+            None if m_conf is None else float(m_conf),
+            mo_label,
+            None if mo_conf is None else float(mo_conf)
+        ))
+    return rows
+
+
+class ResultsStore:
+    """
+    Local SQLite database of analysed samples.
+
+    Stores per-sample summaries, per-particle labels and stage timings,
+    indexed for lab-wide queries by date, diagnosis and patient ID.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Database lama dibuat sebelum ada kolom window (multi-window sampling)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(particles)")}
+            if 'window' not in columns:
+                conn.execute("ALTER TABLE particles ADD COLUMN window INTEGER")
+            # ... dan sebelum ada static_im_count (background subtraction)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(samples)")}
+            if 'static_im_count' not in columns:
+                conn.execute("ALTER TABLE samples ADD COLUMN static_im_count INTEGER NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _connect(self):
+        # Koneksi per operasi: aman dipakai dari thread Streamlit mana pun
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # ------------------------------------------
+    # Write
+    # ------------------------------------------
+    def save_sample(
+        self,
+        motility_results: pd.DataFrame,
+        morphology_results: pd.DataFrame,
+        sample_id: str = None,
+        patient_id: str = None,
+        video_name: str = None,
+        stage_timings: dict = None,
+        analyzed_at: datetime = None,
+        static_im_count: int = 0
+    ) -> str:
+        """
+        Insert one analysed sample; returns its sample_id
+        """
+        return self.save_samples([{
+            'motility_results': motility_results,
+            'morphology_results': morphology_results,
+            'sample_id': sample_id,
+            'patient_id': patient_id,
+            'video_name': video_name,
+            'stage_timings': stage_timings,
+            'analyzed_at': analyzed_at,
+            'static_im_count': static_im_count,
+        }])[0]
+
+    def save_samples(self, samples: list) -> list:
+        """
+        Bulk insert samples in a single transaction.
+
+        Each item is a dict with the keyword arguments of save_sample.
+        Returns the list of sample_ids in input order.
+        """
+        sample_rows, particle_rows, timing_rows, ids = [], [], [], []
+
+        for s in samples:
+            sample_id = s.get('sample_id') or uuid.uuid4().hex
+            analyzed_at = s.get('analyzed_at') or datetime.now()
+            summary = summarize_results(
+                s['motility_results'], s['morphology_results'], s.get('static_im_count', 0)
+            )
+            row = {
+                **summary,
+                'sample_id': sample_id,
+                'patient_id': s.get('patient_id') or None,
+                'video_name': s.get('video_name'),
+                'analyzed_at': analyzed_at.isoformat(timespec='seconds'),
+                'analyzed_month': analyzed_at.strftime('%Y-%m'),
+            }
+            sample_rows.append(tuple(row[c] for c in SAMPLE_COLUMNS))
+            particle_rows.extend(_particle_rows(
+                sample_id, s['motility_results'], s['morphology_results']
+            ))
+            for stage, seconds in (s.get('stage_timings') or {}).items():
+                timing_rows.append((sample_id, stage, float(seconds)))
+            ids.append(sample_id)
+
+        placeholders = ", ".join("?" * len(SAMPLE_COLUMNS))
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT INTO samples ({', '.join(SAMPLE_COLUMNS)}) VALUES ({placeholders})",
+                sample_rows
+            )
+            conn.executemany(
+                "INSERT INTO particles (sample_id, particle, window, motility_label, "
+                "motility_confidence, morphology_label, morphology_confidence) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                particle_rows
+            )
+            conn.executemany(
+                "INSERT INTO stage_timings VALUES (?, ?, ?)",
+                timing_rows
+            )
+        return ids
+
+    def delete_sample(self, sample_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM samples WHERE sample_id = ?", (sample_id,))
+
+    # ------------------------------------------
+    # Read
+    # ------------------------------------------
+    def _query(self, sql, params=()):
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    @staticmethod
+    def _date_filter(start, end):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("analyzed_at >= ?")
+            params.append(pd.Timestamp(start).isoformat())
+        if end is not None:
+            clauses.append("analyzed_at < ?")
+            params.append(pd.Timestamp(end).isoformat())
+        return clauses, params
+
+    def find_samples(
+        self,
+        patient_id: str = None,
+        diagnosis: str = None,
+        start=None,
+        end=None,
+        limit: int = 500
+    ) -> pd.DataFrame:
+        """
+        Sample summaries filtered by patient, diagnosis and date range,
+        newest first
+        """
+        clauses, params = self._date_filter(start, end)
+        if patient_id is not None:
+            clauses.append("patient_id = ?")
+            params.append(patient_id)
+        if diagnosis is not None:
+            clauses.append("diagnosis = ?")
+            params.append(diagnosis)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(
+            f"SELECT * FROM samples {where} ORDER BY analyzed_at DESC LIMIT ?",
+            (*params, limit)
+        )
+
+    def get_particles(self, sample_id: str) -> pd.DataFrame:
+        return self._query(
+            "SELECT window, particle, motility_label, motility_confidence, "
+            "morphology_label, morphology_confidence "
+            "FROM particles WHERE sample_id = ? ORDER BY window, particle",
+            (sample_id,)
+        )
+
+    def get_stage_timings(self, sample_id: str) -> pd.DataFrame:
+        return self._query(
+            "SELECT stage, seconds FROM stage_timings WHERE sample_id = ?",
+            (sample_id,)
+        )
+
+    def monthly_pr_distribution(self, start=None, end=None) -> pd.DataFrame:
+        """
+        PR% distribution per month (count, mean, quartiles, min/max).
+        Reads only the (analyzed_month, pr_percent) covering index.
+        """
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("analyzed_month >= ?")
+            params.append(pd.Timestamp(start).strftime('%Y-%m'))
+        if end is not None:
+            clauses.append("analyzed_month < ?")
+            params.append(pd.Timestamp(end).strftime('%Y-%m'))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        df = self._query(
+            f"SELECT analyzed_month AS month, pr_percent FROM samples {where}",
+            params
+        )
+        if df.empty:
+            return pd.DataFrame(columns=['month', 'samples', 'mean', 'min', 'p25', 'median', 'p75', 'max'])
+
+        grouped = df.groupby('month')['pr_percent']
+        return pd.DataFrame({
+            'samples': grouped.size(),
+            'mean': grouped.mean(),
+            'min': grouped.min(),
+            'p25': grouped.quantile(0.25),
+            'median': grouped.median(),
+            'p75': grouped.quantile(0.75),
+            'max': grouped.max(),
+        }).reset_index()
+
+    def diagnosis_counts(self, start=None, end=None) -> pd.DataFrame:
+        clauses, params = self._date_filter(start, end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(
+            f"SELECT diagnosis, COUNT(*) AS samples FROM samples {where} "
+            "GROUP BY diagnosis ORDER BY samples DESC",
+            params
+        )
+
+    def stage_timing_summary(self) -> pd.DataFrame:
+        return self._query(
+            "SELECT stage, COUNT(*) AS samples, AVG(seconds) AS mean_seconds, "
+            "MAX(seconds) AS max_seconds FROM stage_timings GROUP BY stage"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the SpermTrack results database")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    print(store.monthly_pr_distribution(args.start, args.end).to_string(index=False))
+    print()
+    print(store.diagnosis_counts(args.start, args.end).to_string(index=False))
@@ -0,0 +1,14 @@
+"""
+The modules app.py imports at startup must stay light: TensorFlow,
+huggingface_hub and trackpy/numba load only when their stage first runs.
+"""
+from benchmarks.import_time import APP_IMPORTS, cold_import
+
+# Ruang lebar untuk mesin CI yang lambat; rekaman lokal ~0.3 s
+IMPORT_TIME_LIMIT_SECONDS = 5.0
+
+
+def test_app_imports_are_light():
+    result = cold_import(APP_IMPORTS)
+    assert result['heavy'] == [], f"heavy libraries imported at startup: {result['heavy']}"
+    assert result['seconds'] < IMPORT_TIME_LIMIT_SECONDS
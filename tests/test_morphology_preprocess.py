@@ -0,0 +1,111 @@
+"""
+Equivalence of the batched morphology preprocessing with the original
+per-crop loop (per-component centroid search) it replaced.
+"""
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from models.morphology_analyzer import RESIZE_TO, KERNEL_CLOSE, KERNEL_ERODE, KERNEL_OPEN
+from models.morphology_analyzer import apply_binary_erosion, preprocess_crops
+
+SAMPLE_VIDEO = os.path.join(os.path.dirname(__file__), "..", "temp", "videos", "step3_contrast.mp4")
+
+
+def baseline_apply_binary_erosion(img_bgr):
+    # Salinan apply_binary_erosion sebelum dioptimasi (loop per komponen)
+    gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+    binary = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY_INV, 11, 2
+    )
+    binary = cv2.erode(binary, KERNEL_ERODE, iterations=1)
+    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, KERNEL_OPEN)
+
+    num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(binary)
+    if num_labels <= 1: return 255 * np.ones((RESIZE_TO, RESIZE_TO, 3), dtype=np.uint8)
+
+    h, w = gray.shape
+    cx_img, cy_img = w // 2, h // 2
+    min_dist = np.inf
+    target_label = 1
+    for i in range(1, num_labels):
+        cx, cy = centroids[i]
+        dist = np.sqrt((cx - cx_img)**2 + (cy - cy_img)**2)
+        if dist < min_dist:
+            min_dist = dist
+            target_label = i
+
+    mask = np.zeros_like(binary)
+    mask[labels == target_label] = 255
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    filled = np.zeros_like(mask)
+    cv2.drawContours(filled, contours, -1, 255, thickness=-1)
+    filled = cv2.morphologyEx(filled, cv2.MORPH_CLOSE, KERNEL_CLOSE)
+
+    final_gray = 255 - filled
+    return cv2.cvtColor(final_gray, cv2.COLOR_GRAY2BGR)
+
+
+def video_crops(path, n_crops=120, half=32, seed=0):
+    """64x64 crops (clipped at the border, like run_morphology_analysis) from random frames"""
+    rng = np.random.default_rng(seed)
+    cap = cv2.VideoCapture(path)
+    n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    crops = []
+    for f_idx in rng.integers(0, n_frames, n_crops // 6):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(f_idx))
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        h, w = frame.shape[:2]
+        for x, y in rng.integers(-half // 2, [w + half // 2, h + half // 2], (6, 2)):
+            crop = frame[max(0, y - half):min(h, y + half), max(0, x - half):min(w, x + half)]
+            if crop.size:
+                crops.append(crop)
+    cap.release()
+    return crops
+
+
+def synthetic_crops(seed=0):
+    rng = np.random.default_rng(seed)
+    crops = [rng.integers(0, 256, (64, 64, 3), dtype=np.uint8) for _ in range(20)]
+    crops += [np.full((64, 64, 3), v, dtype=np.uint8) for v in (0, 128, 255)]  # tanpa komponen
+    crops += [rng.integers(0, 256, (h, w, 3), dtype=np.uint8) for h, w in [(1, 64), (64, 7), (33, 50)]]
+    return crops
+
+
+def baseline_preprocess(crop):
+    return baseline_apply_binary_erosion(cv2.resize(crop, (RESIZE_TO, RESIZE_TO)))
+
+
+@pytest.fixture(scope="module")
+def crops():
+    crops = synthetic_crops()
+    if os.path.exists(SAMPLE_VIDEO):
+        crops += video_crops(SAMPLE_VIDEO)
+    return crops
+
+
+def test_apply_binary_erosion_matches_baseline(crops):
+    for crop in crops:
+        resized = cv2.resize(crop, (RESIZE_TO, RESIZE_TO))
+        np.testing.assert_array_equal(apply_binary_erosion(resized), baseline_apply_binary_erosion(resized))
+
+
+def test_preprocess_crops_matches_baseline(crops):
+    processed = preprocess_crops(crops, max_workers=4, normalize=False)
+    assert processed.dtype == np.uint8
+    assert processed.shape == (len(crops), RESIZE_TO, RESIZE_TO, 3)
+    np.testing.assert_array_equal(processed, np.stack([baseline_preprocess(c) for c in crops]))
+
+
+def test_preprocess_crops_normalized_and_empty(crops):
+    normalized = preprocess_crops(crops[:5])
+    assert normalized.dtype == np.float32
+    np.testing.assert_array_equal(
+        normalized, np.stack([baseline_preprocess(c) for c in crops[:5]]).astype(np.float32) / 255.0
+    )
+    assert preprocess_crops([]).shape == (0, RESIZE_TO, RESIZE_TO, 3)
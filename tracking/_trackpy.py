@@ -0,0 +1,12 @@
+"""
+Single import point for trackpy inside the app: numba's on-disk cache
+is switched on before any of trackpy's jitted kernels can compile.
+
+    from tracking._trackpy import tp
+"""
+from .warmup import enable_numba_cache
+
+# Kernel numba trackpy disimpan di cache disk, tidak dikompilasi ulang tiap proses
+enable_numba_cache()
+
+import trackpy as tp  # noqa: E402
@@ -8,9 +8,21 @@ Original file is located at
 """
 
 import cv2
-import trackpy as tp
 import pandas as pd
 
+from video.frame_pipeline import FramePipeline
+from .schema import compact_detections
+from ._trackpy import tp
+
+# Argumen tp.locate/tp.batch detektor; dipakai juga oleh QC, hitung objek
+# statis dan warm-up agar tidak menyimpang dari detektor sebenarnya
+DETECT_LOCATE_KWARGS = {
+    'invert': True,
+    'preprocess': True,
+    'max_iterations': 10,
+    'engine': "numba",
+}
+
 
 def batch_detect_sperm(
     video_path: str,
@@ -21,21 +33,13 @@ def batch_detect_sperm(
 ) -> pd.DataFrame:
     """
     Batch detection using tp.batch
-    Output: DataFrame detections
+    Output: DataFrame detections (compact schema, see tracking/schema.py)
     """
 
-    cap = cv2.VideoCapture(video_path)
-    frames = []
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        frames.append(gray)
+    def to_gray(frame_index, frame):
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
-    cap.release()
+    frames = [gray for _, gray in FramePipeline(video_path, [to_gray])]
 
     f = tp.batch(
         frames,
@@ -43,12 +47,9 @@ def batch_detect_sperm(
         minmass=minmass,
         separation=separation,
         noise_size=noise_size,
-        invert=True,
-        preprocess=True,
-        max_iterations=10,
         filter_after=True,
         characterize=True,
-        engine="numba"
+        **DETECT_LOCATE_KWARGS
     )
 
-    return f
\ No newline at end of file
+    return compact_detections(f)
\ No newline at end of file
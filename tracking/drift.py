@@ -7,9 +7,11 @@ Original file is located at
     https://colab.research.google.com/drive/1gbe-kvoKq-HK-VNpWuVLEhAczmHEF7jC
 """
 
-import trackpy as tp
+from ._trackpy import tp
 import pandas as pd
 
+from .schema import compact_tracks
+
 
 def correct_drift(
     tracks: pd.DataFrame,
@@ -17,9 +19,10 @@ def correct_drift(
 ) -> pd.DataFrame:
     """
     Compute and subtract drift from trajectories
+    (subtract_drift upcasts x/y to float64, so the compact schema is re-applied)
     """
 
     drift = tp.compute_drift(tracks, smoothing=smoothing)
     corrected = tp.subtract_drift(tracks, drift)
 
-    return corrected
\ No newline at end of file
+    return compact_tracks(corrected).reset_index(drop=True)
\ No newline at end of file
@@ -7,9 +7,11 @@ Original file is located at
     https://colab.research.google.com/drive/1gbe-kvoKq-HK-VNpWuVLEhAczmHEF7jC
 """
 
-import trackpy as tp
 import pandas as pd
 
+from .schema import compact_tracks
+from ._trackpy import tp
+
 
 def link_and_filter_tracks(
     detections: pd.DataFrame,
@@ -29,4 +31,4 @@ def link_and_filter_tracks(
 
     t_filtered = tp.filter_stubs(t, min_frames)
 
-    return t_filtered
\ No newline at end of file
+    return compact_tracks(t_filtered)
\ No newline at end of file
@@ -8,9 +8,12 @@ Original file is located at
 """
 
 import cv2
-import trackpy as tp
 import pandas as pd
 
+from video.frame_pipeline import FramePipeline
+from .schema import compact_detections
+from ._trackpy import tp
+
 
 def locate_sperm_from_video(
     video_path: str,
@@ -24,15 +27,7 @@ def locate_sperm_from_video(
     Output: DataFrame detections
     """
 
-    cap = cv2.VideoCapture(video_path)
-    detections = []
-    frame_index = 0
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
+    def locate(frame_index, frame):
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
         detected = tp.locate(
@@ -50,13 +45,17 @@ def locate_sperm_from_video(
 
         if detected is not None and len(detected) > 0:
             detected["frame"] = frame_index
-            detections.append(detected)
-
-        frame_index += 1
+            return compact_detections(detected)
+        return None
 
-    cap.release()
+    # Decoding dan tp.locate per frame berjalan overlap di FramePipeline
+    detections = [
+        detected
+        for _, detected in FramePipeline(video_path, [locate])
+        if detected is not None
+    ]
 
     if detections:
         return pd.concat(detections, ignore_index=True)
     else:
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
@@ -7,17 +7,18 @@ from .drift import correct_drift
 
 def tracking_pipeline(
     prepared_video_path: str,
-    output_csv_path: str
+    output_csv_path: str,
+    detect_params: dict = None
 ) -> pd.DataFrame:
     """
     Full sperm tracking pipeline:
-    1. Batch detection
+    1. Batch detection (detect_params override batch_detect_sperm defaults)
     2. Linking + filtering
     3. Drift correction
     4. Save final_tracks.csv
     """
 
-    detections = batch_detect_sperm(prepared_video_path)
+    detections = batch_detect_sperm(prepared_video_path, **(detect_params or {}))
 
     if detections.empty:
         raise ValueError("No sperm detected in video")
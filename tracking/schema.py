@@ -0,0 +1,47 @@
+import pandas as pd
+
+# Kolom yang dipakai tahap hilir (linking, drift, motility, morphology, app)
+DETECTION_SCHEMA = {
+    "frame": "int32",
+    "y": "float32",
+    "x": "float32",
+    "signal": "float32",
+}
+
+TRACK_SCHEMA = {
+    **DETECTION_SCHEMA,
+    "particle": "int32",
+}
+
+
+def apply_schema(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """
+    Keep only the schema columns present in df, cast to compact dtypes
+    """
+    columns = [c for c in schema if c in df.columns]
+    return df[columns].astype({c: schema[c] for c in columns})
+
+
+def compact_detections(detections: pd.DataFrame) -> pd.DataFrame:
+    return apply_schema(detections, DETECTION_SCHEMA)
+
+
+def compact_tracks(tracks: pd.DataFrame) -> pd.DataFrame:
+    return apply_schema(tracks, TRACK_SCHEMA)
+
+
+def memory_report(**tables) -> pd.DataFrame:
+    """
+    Deep memory usage per table, e.g. memory_report(before=df, after=compact_tracks(df))
+    """
+    rows = []
+    for name, df in tables.items():
+        rows.append({
+            "table": name,
+            "rows": len(df),
+            "columns": len(df.columns),
+            "memory_mb": df.memory_usage(deep=True).sum() / 1024 ** 2,
+        })
+    report = pd.DataFrame(rows)
+    report["ratio"] = report["memory_mb"] / report["memory_mb"].iloc[0]
+    return report
@@ -0,0 +1,226 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+
+import cv2
+import numpy as np
+import pandas as pd
+from ._trackpy import tp
+from trackpy.preprocessing import bandpass, convert_to_int, invert_image
+
+
+def read_frame_subset(
+    video_path: str,
+    n_frames=120,
+    start=None
+) -> list:
+    """
+    Read a contiguous block of grayscale frames (default: middle of the video).
+    Contiguous so that linking statistics stay meaningful.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video: {video_path}")
+
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if start is None:
+        start = max(0, (total - n_frames) // 2)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    frames = []
+    while len(frames) < n_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+
+    cap.release()
+    return frames
+
+
+def preprocess_frames(frames, diameter, noise_size) -> list:
+    """
+    Same invert + bandpass as tp.locate(invert=True, preprocess=True),
+    computed once and stored as (scale_factor, uint8 image)
+    """
+    processed = []
+    for frame in frames:
+        image = bandpass(invert_image(frame), noise_size, diameter, threshold=1)
+        processed.append(convert_to_int(image, np.uint8))
+    return processed
+
+
+def locate_candidates(processed, diameter, separation, engine="numba") -> pd.DataFrame:
+    """
+    Locate on cached preprocessed frames with minmass=0.
+    Every minmass setting is a filter on the returned 'mass' column.
+    """
+    features = []
+    for frame_no, (scale_factor, image) in enumerate(processed):
+        f = tp.locate(
+            image,
+            diameter=diameter,
+            minmass=0,
+            separation=separation,
+            preprocess=False,
+            max_iterations=10,
+            characterize=False,
+            engine=engine
+        )
+        if len(f) == 0:
+            continue
+        # Koreksi skala agar mass setara dengan tp.locate(preprocess=True)
+        f["mass"] = f["mass"] / scale_factor
+        f["frame"] = frame_no
+        features.append(f[["y", "x", "mass", "frame"]])
+
+    if not features:
+        return pd.DataFrame(columns=["y", "x", "mass", "frame"])
+    return pd.concat(features, ignore_index=True)
+
+
+def suggest_minmass(mass: pd.Series, bins=128) -> float:
+    """
+    Otsu threshold on log10(mass): valley between the background/noise
+    peak and the sperm peak of the mass histogram
+    """
+    log_mass = np.log10(mass[mass > 0].to_numpy())
+    if len(log_mass) < 2 or log_mass.min() == log_mass.max():
+        return float(mass.min()) if len(mass) else 0.0
+
+    hist, edges = np.histogram(log_mass, bins=bins)
+    centers = (edges[:-1] + edges[1:]) / 2
+    w0 = np.cumsum(hist)
+    w1 = w0[-1] - w0
+    m0 = np.cumsum(hist * centers) / np.maximum(w0, 1)
+    m1 = (np.sum(hist * centers) - np.cumsum(hist * centers)) / np.maximum(w1, 1)
+    between = w0 * w1 * (m0 - m1) ** 2
+
+    return float(10 ** edges[np.argmax(between) + 1])
+
+
+def track_statistics(
+    features: pd.DataFrame,
+    minmass,
+    n_frames,
+    search_range=10,
+    memory=5,
+    min_frames=30
+) -> dict:
+    """
+    Detection density and track-length statistics for one minmass value
+    """
+    f = features[features["mass"] > minmass]
+    stats = {
+        "detections_per_frame": len(f) / max(n_frames, 1),
+        "tracks": 0,
+        "long_tracks": 0,
+        "median_track_length": 0.0,
+        "long_fraction": 0.0,
+    }
+    if f.empty:
+        return stats
+
+    t = tp.link_df(f, search_range=search_range, memory=memory)
+    lengths = t.groupby("particle").size()
+    long_tracks = int((lengths >= min_frames).sum())
+    stats.update({
+        "tracks": int(len(lengths)),
+        "long_tracks": long_tracks,
+        "median_track_length": float(lengths.median()),
+        "long_fraction": long_tracks / len(lengths),
+    })
+    return stats
+
+
+def sweep_detector_params(
+    video_path: str,
+    diameters=(21,),
+    noise_sizes=(1,),
+    separations=(30, 50),
+    minmasses=None,
+    n_frames=120,
+    search_range=10,
+    memory=5,
+    min_frames=30,
+    max_workers=None,
+    engine="numba"
+) -> pd.DataFrame:
+    """
+    Evaluate detector parameter combinations on a subset of frames.
+
+    Bandpass preprocessing runs once per (diameter, noise_size), locate
+    once per separation with minmass=0; all minmass values are then
+    evaluated as filters on that result. Locate and linking jobs run in
+    a thread pool.
+    """
+    tp.quiet()
+    frames = read_frame_subset(video_path, n_frames=n_frames)
+    if not frames:
+        raise ValueError(f"No frames could be read from {video_path}")
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for diameter, noise_size in product(diameters, noise_sizes):
+            processed = preprocess_frames(frames, diameter, noise_size)
+
+            candidates = dict(zip(
+                separations,
+                pool.map(
+                    lambda sep: locate_candidates(processed, diameter, sep, engine),
+                    separations
+                )
+            ))
+
+            all_mass = pd.concat([c["mass"] for c in candidates.values()])
+            otsu = suggest_minmass(all_mass)
+            if minmasses is None:
+                grid = sorted({500.0, round(otsu, 1), *np.round(all_mass.quantile([0.5, 0.75, 0.9]).to_numpy(), 1)})
+            else:
+                grid = list(minmasses)
+
+            combos = list(product(separations, grid))
+            stats = pool.map(
+                lambda combo: track_statistics(
+                    candidates[combo[0]], combo[1], len(frames),
+                    search_range=search_range, memory=memory, min_frames=min_frames
+                ),
+                combos
+            )
+            for (separation, minmass), s in zip(combos, stats):
+                results.append({
+                    "diameter": diameter,
+                    "noise_size": noise_size,
+                    "separation": separation,
+                    "minmass": minmass,
+                    "suggested_minmass": otsu,
+                    **s
+                })
+
+    return pd.DataFrame(results)
+
+
+def auto_tune_detector(video_path: str, **sweep_kwargs):
+    """
+    Run a sweep and pick the parameters with the most long tracks,
+    weighted by the fraction of tracks that are long (penalizes noise
+    that only produces stubs). Ties go to the minmass closest to the
+    histogram suggestion.
+
+    Returns (params for batch_detect_sperm, sweep results DataFrame)
+    """
+    results = sweep_detector_params(video_path, **sweep_kwargs)
+
+    results["score"] = results["long_tracks"] * results["long_fraction"]
+    results["minmass_gap"] = (np.log10(results["minmass"].clip(lower=1))
+                              - np.log10(results["suggested_minmass"].clip(lower=1))).abs()
+    results = results.sort_values(["score", "minmass_gap"], ascending=[False, True]).reset_index(drop=True)
+
+    best = results.iloc[0]
+    noise_size = float(best["noise_size"])
+    params = {
+        "diameter": int(best["diameter"]),
+        "minmass": float(best["minmass"]),
+        "separation": int(best["separation"]),
+        "noise_size": int(noise_size) if noise_size.is_integer() else noise_size,
+    }
+    return params, results.drop(columns="minmass_gap")
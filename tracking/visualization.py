@@ -1,3 +1,5 @@
+from collections import OrderedDict
+
 import cv2
 import numpy as np
 import pandas as pd
@@ -18,40 +20,152 @@ def draw_locate_frame(frame_gray, detections_df, frame_idx):
 
 
 def draw_tracks(frame_gray, tracks_df, frame_idx):
-    vis = cv2.cvtColor(frame_gray, cv2.COLOR_GRAY2BGR)
+    # Untuk banyak frame, buat TrackOverlay sekali lalu panggil render()
+    return TrackOverlay(tracks_df).render(frame_gray, frame_idx)
 
-    # warna konsisten per particle
-    rng = np.random.default_rng(42)
-    particle_ids = tracks_df["particle"].unique()
-    colors = {
-        pid: tuple(int(c) for c in rng.integers(50, 255, size=3))
-        for pid in particle_ids
-    }
-
-    for pid in particle_ids:
-        grp = tracks_df[tracks_df["particle"] == pid]
-        grp = grp.sort_values("frame")
-
-        pts = grp[grp["frame"] <= frame_idx][["x", "y"]].values.astype(int)
-
-        # draw trajectory
-        for i in range(1, len(pts)):
-            cv2.line(
-                vis,
-                tuple(pts[i - 1]),
-                tuple(pts[i]),
-                colors[pid],
-                2           # 🔥 lebih tebal seperti tp.plot_traj
-            )
-
-        # draw current position (kepala lintasan)
-        if len(pts) > 0:
-            cv2.circle(
-                vis,
-                tuple(pts[-1]),
-                3,
-                colors[pid],
-                -1
-            )
 
-    return vis
+class TrackOverlay:
+    """
+    Overlay renderer built once per tracks table.
+
+    Colors are assigned once per particle, coordinates are sorted into
+    per-particle arrays and the trail layer is cached at keyframes, so
+    rendering any frame only draws the trail segments since the nearest
+    keyframe instead of re-filtering the whole table.
+    """
+
+    def __init__(
+        self,
+        tracks_df: pd.DataFrame,
+        keyframe_interval=30,
+        max_cached_layers=64,
+        trail_thickness=2,
+        head_radius=3,
+        detection_radius=8
+    ):
+        self.keyframe_interval = keyframe_interval
+        self.max_cached_layers = max_cached_layers
+        self.trail_thickness = trail_thickness
+        self.head_radius = head_radius
+        self.detection_radius = detection_radius
+
+        df = tracks_df.reset_index(drop=True)
+        pids = df["particle"].to_numpy()
+        frames = df["frame"].to_numpy().astype(np.int64)
+        pts = df[["x", "y"]].to_numpy().astype(np.int32)
+
+        # warna konsisten per particle (urutan sama seperti draw_tracks lama)
+        rng = np.random.default_rng(42)
+        self.particle_ids = df["particle"].unique()
+        self.colors = [
+            tuple(int(c) for c in rng.integers(50, 255, size=3))
+            for _ in self.particle_ids
+        ]
+
+        # Per-particle arrays, sorted by frame
+        pidx = pd.Index(self.particle_ids).get_indexer(pids)
+        order = np.lexsort((frames, pidx))
+        pidx_sorted = pidx[order]
+        bounds = np.flatnonzero(np.diff(pidx_sorted)) + 1
+        # Sort sekali; setiap partikel hanya view ke array yang sama
+        self._frames = np.split(frames[order], bounds) if len(order) else []
+        self._pts = np.split(pts[order], bounds) if len(order) else []
+
+        # Particles with rows inside each keyframe block (excluding the keyframe itself)
+        k = self.keyframe_interval
+        in_block = frames % k != 0
+        block_pairs = np.unique(
+            np.stack([frames[in_block] // k, pidx[in_block]], axis=1), axis=0
+        ) if in_block.any() else np.empty((0, 2), dtype=np.int64)
+        self._block_particles = {}
+        for b, p in block_pairs:
+            self._block_particles.setdefault(int(b), []).append(int(p))
+
+        # Detections per frame, sorted by frame
+        det_order = np.argsort(frames, kind="stable")
+        self._det_frames = frames[det_order]
+        self._det_pts = pts[det_order]
+
+        self.n_frames = int(frames.max()) + 1 if len(frames) else 0
+        self._layers = OrderedDict()
+
+    # ------------------------------------------
+    # Cached keyframe layers
+    # ------------------------------------------
+    def _build_layer(self, block, shape):
+        """
+        Trails up to the block's keyframe plus the final heads of
+        particles that do not move inside the block
+        """
+        k = block * self.keyframe_interval
+        layer = np.zeros((*shape, 3), dtype=np.uint8)
+        active = set(self._block_particles.get(block, ()))
+
+        heads = []
+        for p, (frames, pts) in enumerate(zip(self._frames, self._pts)):
+            n = np.searchsorted(frames, k, side="right")
+            if n == 0:
+                continue
+            if n > 1:
+                cv2.polylines(layer, [pts[:n]], False, self.colors[p], self.trail_thickness)
+            if p not in active:
+                heads.append((tuple(pts[n - 1]), self.colors[p]))
+
+        for center, color in heads:
+            cv2.circle(layer, center, self.head_radius, color, -1)
+
+        mask = layer.any(axis=2)
+        return layer, mask
+
+    def _get_layer(self, block, shape):
+        key = (block, shape)
+        if key in self._layers:
+            self._layers.move_to_end(key)
+            return self._layers[key]
+
+        layer = self._build_layer(block, shape)
+        self._layers[key] = layer
+        if len(self._layers) > self.max_cached_layers:
+            self._layers.popitem(last=False)
+        return layer
+
+    # ------------------------------------------
+    # Render
+    # ------------------------------------------
+    def _to_bgr(self, frame):
+        if frame.ndim == 2:
+            return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        return frame.copy()
+
+    def render(self, frame, frame_idx):
+        """
+        Trajectories (trail + current head) of every particle up to frame_idx
+        """
+        vis = self._to_bgr(frame)
+        block = max(frame_idx, 0) // self.keyframe_interval
+        k = block * self.keyframe_interval
+
+        layer, mask = self._get_layer(block, vis.shape[:2])
+        np.copyto(vis, layer, where=mask[..., None])
+
+        for p in self._block_particles.get(block, ()):
+            frames, pts = self._frames[p], self._pts[p]
+            n = np.searchsorted(frames, frame_idx, side="right")
+            if n == 0:
+                continue
+            i0 = max(np.searchsorted(frames, k, side="right") - 1, 0)
+            if n - i0 > 1:
+                cv2.polylines(vis, [pts[i0:n]], False, self.colors[p], self.trail_thickness)
+            cv2.circle(vis, tuple(pts[n - 1]), self.head_radius, self.colors[p], -1)
+
+        return vis
+
+    def render_detections(self, frame, frame_idx):
+        """
+        Detections present in frame_idx (same style as draw_locate_frame)
+        """
+        vis = self._to_bgr(frame)
+        lo, hi = np.searchsorted(self._det_frames, [frame_idx, frame_idx + 1])
+        for x, y in self._det_pts[lo:hi]:
+            cv2.circle(vis, (int(x), int(y)), self.detection_radius, (0, 255, 0), 2)
+        return vis
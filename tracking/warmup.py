@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Cache hasil kompilasi numba di luar site-packages, bertahan antar restart
+DEFAULT_NUMBA_CACHE_DIR = os.environ.get(
+    "SPERMTRACK_NUMBA_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "spermtrack", "numba")
+)
+
+_cache_lock = threading.Lock()
+_cache_enabled = False
+
+
+def enable_numba_cache(cache_dir: str = DEFAULT_NUMBA_CACHE_DIR) -> str:
+    """
+    Turn on numba's on-disk cache for trackpy's jitted kernels (refine
+    and subnet linking). Must run before the kernels are first compiled;
+    later calls are no-ops. Returns the cache directory in use.
+    """
+    global _cache_enabled
+    with _cache_lock:
+        if _cache_enabled:
+            return os.environ.get("NUMBA_CACHE_DIR", cache_dir)
+
+        # NUMBA_CACHE_DIR yang sudah di-set user tetap dihormati
+        cache_dir = os.environ.setdefault("NUMBA_CACHE_DIR", cache_dir)
+        os.makedirs(cache_dir, exist_ok=True)
+
+        import numba
+        import trackpy  # noqa: F401  (mendaftarkan semua fungsi try_numba_jit)
+        from trackpy.try_numba import _registered_functions
+
+        numba.config.CACHE_DIR = cache_dir
+        for f in _registered_functions:
+            dispatcher = f.compiled
+            if dispatcher is not None and hasattr(dispatcher, "enable_caching"):
+                dispatcher.enable_caching()
+
+        _cache_enabled = True
+        return cache_dir
+
+
+def synthetic_frames(n_frames=3, size=128, n_spots=6, diameter=21, seed=0) -> list:
+    """
+    Small uint8 frames with dark gaussian spots on a bright background,
+    drifting a few pixels per frame (same dtype/polarity as prepared video)
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[:size, :size]
+    centers = rng.uniform(diameter, size - diameter, (n_spots, 2))
+    sigma = diameter / 6
+
+    frames = []
+    for i in range(n_frames):
+        img = np.full((size, size), 200.0)
+        for cy, cx in centers + i * 2.0:
+            img -= 150 * np.exp(-((yy - cy) ** 2 + (xx - cx) ** 2) / (2 * sigma ** 2))
+        frames.append(np.clip(img + rng.normal(0, 3, img.shape), 0, 255).astype(np.uint8))
+    return frames
+
+
+def warmup_tracking(detect_params: dict = None) -> float:
+    """
+    Compile the numba refine and linking kernels on synthetic data so the
+    first real sample does not pay JIT time. Uses the same tp.batch
+    arguments as batch_detect_sperm, but in this process (processes=1):
+    tp.batch worker processes forked afterwards inherit the compiled
+    kernels, and later processes load them from the disk cache.
+    Returns elapsed seconds.
+    """
+    from ._trackpy import tp
+    from .batch import DETECT_LOCATE_KWARGS
+
+    t0 = time.perf_counter()
+    params = {"diameter": 21, "separation": 50, "noise_size": 1}
+    params.update(detect_params or {})
+
+    tp.batch(
+        synthetic_frames(diameter=params["diameter"]),
+        minmass=0,  # semua spot sintetis harus lolos agar refine terkompilasi
+        diameter=params["diameter"],
+        separation=params["separation"],
+        noise_size=params["noise_size"],
+        filter_after=True,
+        characterize=True,
+        processes=1,
+        **DETECT_LOCATE_KWARGS
+    )
+
+    # Subnet > 4x4 partikel: mode hybrid baru memakai subnet linker numba
+    x = np.arange(6) * 3.0
+    detections = pd.DataFrame({
+        "frame": np.repeat([0, 1], 6),
+        "x": np.concatenate([x, x + 1.0]),
+        "y": np.full(12, 10.0),
+    })
+    tp.link_df(detections, search_range=10, memory=5)
+
+    return time.perf_counter() - t0
+
+
+def start_background_warmup(detect_params: dict = None) -> threading.Thread:
+    """
+    Run warmup_tracking on a daemon thread (app startup); errors are only printed
+    """
+    def run():
+        try:
+            seconds = warmup_tracking(detect_params)
+            print(f"Numba warm-up selesai dalam {seconds:.2f} s")
+        except Exception as e:
+            print(f"Numba warm-up gagal: {e}")
+
+    thread = threading.Thread(target=run, name="numba-warmup", daemon=True)
+    thread.start()
+    return thread
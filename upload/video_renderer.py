@@ -1,59 +1,213 @@
+import os
+import json
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 import numpy as np
-import tempfile
 import pandas as pd
 
-def create_motility_video(video_path, tracks_df, motility_results):
+from video.frame_pipeline import FramePipeline, VideoEncoder, H264
+
+# Panjang segmen default (detik) untuk output progresif
+DEFAULT_SEGMENT_SECONDS = 2.0
+
+def _build_annotator(tracks_df, motility_results):
+    """
+    Stage FramePipeline yang menggambar posisi + lintasan berwarna per label.
+    Lintasan dihitung dari tracks table, jadi setiap rentang frame bisa
+    dirender terpisah.
+    """
     # Gabungkan data tracking dengan label motilitas berdasarkan ID partikel
     # Pastikan motility_results memiliki kolom 'particle' dan 'motility_label'
     merged_df = tracks_df.merge(motility_results[['particle', 'motility_label']], on='particle', how='left')
-    
-    cap = cv2.VideoCapture(video_path)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    
-    # Setup Video Writer
-    temp_out = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-    fourcc = cv2.VideoWriter_fourcc(*'avc1')
-    out = cv2.VideoWriter(temp_out.name, fourcc, fps, (width, height))
-    
+    merged_df = merged_df.sort_values(['particle', 'frame'], kind='stable').reset_index(drop=True)
+
     # Warna: BGR (OpenCV menggunakan BGR bukan RGB)
     colors = {
         'PR': (0, 255, 0),    # Hijau
         'NP': (0, 255, 255),  # Kuning
         'IM': (0, 0, 255)     # Merah
     }
-    
-    frame_idx = 0
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret: break
-        
+
+    # Index sekali jalan: baris per frame dan lintasan (history) per partikel
+    pids = merged_df['particle'].to_numpy()
+    frames = merged_df['frame'].to_numpy()
+    pts = merged_df[['x', 'y']].to_numpy().astype(np.int32)
+    row_colors = [colors.get(label, (255, 255, 255)) for label in merged_df['motility_label']] # Putih jika tidak ada label
+    rows_by_frame = merged_df.groupby('frame').indices
+    history = {
+        pid: (frames[idx], pts[idx])
+        for pid, idx in merged_df.groupby('particle').indices.items()
+    }
+
+    def annotate(frame_idx, frame):
         # Ambil data untuk frame saat ini
-        current_data = merged_df[merged_df['frame'] == frame_idx]
-        
-        for _, row in current_data.iterrows():
-            pid = row['particle']
-            label = row['motility_label']
-            color = colors.get(label, (255, 255, 255)) # Putih jika tidak ada label
-            
+        for i in rows_by_frame.get(frame_idx, ()):
+            color = row_colors[i]
+
             # 1. Gambar Lingkaran di posisi sekarang
-            cv2.circle(frame, (int(row['x']), int(row['y'])), 4, color, -1)
-            
+            cv2.circle(frame, (int(pts[i][0]), int(pts[i][1])), 4, color, -1)
+
             # 2. Gambar Lintasan (History)
-            history = merged_df[(merged_df['particle'] == pid) & (merged_df['frame'] <= frame_idx)]
-            if len(history) > 1:
-                points = history[['x', 'y']].values.astype(np.int32)
-                cv2.polylines(frame, [points], isClosed=False, color=color, thickness=1)
-                
+            p_frames, p_pts = history[pids[i]]
+            n = np.searchsorted(p_frames, frame_idx, side='right')
+            if n > 1:
+                cv2.polylines(frame, [p_pts[:n]], isClosed=False, color=color, thickness=1)
+
             # 3. Opsional: Tulis ID Partikel
-            # cv2.putText(frame, str(int(pid)), (int(row['x'])+5, int(row['y'])-5), 
+            # cv2.putText(frame, str(int(pid)), (int(row['x'])+5, int(row['y'])-5),
             #             cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+        return frame
+
+    return annotate
+
+def create_motility_video(video_path, tracks_df, motility_results, output_path=None):
+    # Default: tulis di folder job yang sama dengan video, ikut terhapus bersama job
+    if output_path is None:
+        output_path = os.path.join(os.path.dirname(os.path.abspath(video_path)), "motility_overlay.mp4")
+
+    pipeline = FramePipeline(video_path, [_build_annotator(tracks_df, motility_results)])
+
+    # Setup Video Writer (encode di thread terpisah)
+    with VideoEncoder(output_path, H264, pipeline.fps, (pipeline.width, pipeline.height)) as out:
+        for _, frame in pipeline:
+            out.write(frame)
+
+    return output_path
 
-        out.write(frame)
-        frame_idx += 1
-        
+def _render_segment(video_path, annotate, start, stop, output_path, fourcc):
+    # Paralelisme ada di level segmen, jadi satu worker per pipeline cukup
+    pipeline = FramePipeline(video_path, [annotate], workers=1, start=start, stop=stop)
+    with VideoEncoder(output_path, fourcc, pipeline.fps, (pipeline.width, pipeline.height)) as out:
+        for _, frame in pipeline:
+            out.write(frame)
+    return out.frames_written
+
+def _write_manifest(path, manifest):
+    # Tulis atomik agar pembaca tidak pernah melihat JSON setengah jadi
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def iter_motility_segments(
+    video_path,
+    tracks_df,
+    motility_results,
+    output_dir=None,
+    segment_seconds=DEFAULT_SEGMENT_SECONDS,
+    max_workers=None,
+    fourcc=H264
+):
+    """
+    Render the annotated video as short, independently playable H.264 MP4
+    segments (browser-playable, via ffmpeg), several frame ranges in parallel.
+
+    Yields (index, n_segments, segment_path) in playback order as soon as
+    each segment and all earlier ones are finished, so the UI can start
+    playing segment 0 while the rest are still rendering. A manifest.json
+    next to the segments lists fps, size and every segment's frame range,
+    and is updated after each segment.
+    """
+    # Default: folder job yang sama dengan video, ikut terhapus bersama job
+    if output_dir is None:
+        output_dir = os.path.join(os.path.dirname(os.path.abspath(video_path)), "motility_segments")
+    os.makedirs(output_dir, exist_ok=True)
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     cap.release()
-    out.release()
-    return temp_out.name
+
+    segment_frames = max(1, int(round(segment_seconds * fps)))
+    ranges = [(s, min(s + segment_frames, frame_count)) for s in range(0, frame_count, segment_frames)]
+
+    manifest_path = os.path.join(output_dir, "manifest.json")
+    manifest = {
+        'fps': fps,
+        'width': width,
+        'height': height,
+        'frame_count': frame_count,
+        'segment_frames': segment_frames,
+        'complete': False,
+        'segments': [
+            {
+                'index': i,
+                'file': f"segment_{i:03d}.mp4",
+                'start_frame': start,
+                'end_frame': stop,
+                'duration': (stop - start) / fps if fps else 0.0,
+                'ready': False
+            }
+            for i, (start, stop) in enumerate(ranges)
+        ]
+    }
+    _write_manifest(manifest_path, manifest)
+
+    annotate = _build_annotator(tracks_df, motility_results)
+    max_workers = max_workers or min(len(ranges), os.cpu_count() or 1) or 1
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Segmen disubmit berurutan, jadi segmen awal selesai lebih dulu
+        futures = [
+            pool.submit(
+                _render_segment, video_path, annotate, start, stop,
+                os.path.join(output_dir, seg['file']), fourcc
+            )
+            for seg, (start, stop) in zip(manifest['segments'], ranges)
+        ]
+        try:
+            for seg, future in zip(manifest['segments'], futures):
+                future.result()
+                seg['ready'] = True
+                _write_manifest(manifest_path, manifest)
+                yield seg['index'], len(ranges), os.path.join(output_dir, seg['file'])
+        finally:
+            # Consumer berhenti lebih awal: segmen yang belum mulai dibatalkan
+            for future in futures:
+                future.cancel()
+
+    manifest['complete'] = True
+    _write_manifest(manifest_path, manifest)
+
+def create_motility_segments(video_path, tracks_df, motility_results, output_dir=None, **kwargs):
+    """
+    Render all segments (see iter_motility_segments); returns the manifest path
+    """
+    segments = list(iter_motility_segments(video_path, tracks_df, motility_results, output_dir, **kwargs))
+    return os.path.join(os.path.dirname(segments[0][2]), "manifest.json") if segments else None
+
+def concat_motility_segments(manifest_path, output_path=None):
+    """
+    Join the rendered segments (manifest order) into one full-length MP4
+    with ffmpeg's concat demuxer. Segments are already H.264, so the
+    streams are copied without re-encoding. Returns the output path.
+    """
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    segment_dir = os.path.dirname(os.path.abspath(manifest_path))
+    paths = [os.path.join(segment_dir, seg['file']) for seg in manifest['segments'] if seg['ready']]
+    if not paths:
+        raise ValueError(f"No rendered segments in {manifest_path}")
+
+    # Default: di samping folder segmen, ikut terhapus bersama job
+    if output_path is None:
+        output_path = os.path.join(os.path.dirname(segment_dir), "motility_overlay.mp4")
+
+    list_path = os.path.join(segment_dir, "concat.txt")
+    with open(list_path, "w") as f:
+        f.writelines(f"file '{p}'\n" for p in paths)
+
+    subprocess.run(
+        ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+         "-c", "copy", "-movflags", "+faststart", output_path],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.STDOUT,
+        check=True
+    )
+    return output_path
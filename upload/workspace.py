@@ -0,0 +1,161 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+# Root bisa diarahkan ke tmpfs/NVMe, mis. SPERMTRACK_WORKDIR=/dev/shm/spermtrack
+DEFAULT_ROOT = os.environ.get(
+    "SPERMTRACK_WORKDIR",
+    os.path.join(tempfile.gettempdir(), "spermtrack")
+)
+DEFAULT_QUOTA_BYTES = int(float(os.environ.get("SPERMTRACK_WORKDIR_QUOTA_GB", "10")) * 1024 ** 3)
+DEFAULT_MAX_AGE_SECONDS = float(os.environ.get("SPERMTRACK_WORKDIR_MAX_AGE_HOURS", "24")) * 3600
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Marker di dalam job: job sedang dipakai sesi yang masih hidup
+LEASE_FILE = ".lease"
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+class Workspace:
+    """
+    Per-job scratch directories under one root with a size quota.
+
+    Jobs are plain directories named <prefix>_<id>. When the root grows
+    past the quota, or a job has not been touched for max_age_seconds,
+    the least recently touched jobs are evicted first. Jobs passed as
+    `keep` (the caller's own job) are never evicted, and leased jobs
+    (in use by a live session, lease refreshed by touch()) are only
+    evicted once their lease is older than max_age_seconds.
+    """
+
+    def __init__(
+        self,
+        root: str = DEFAULT_ROOT,
+        quota_bytes: int = DEFAULT_QUOTA_BYTES,
+        max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS
+    ):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    # ------------------------------------------
+    # Jobs
+    # ------------------------------------------
+    def create_job(self, prefix: str = "job") -> str:
+        """
+        New empty job directory; evicts old jobs first if over quota
+        """
+        job_dir = os.path.join(self.root, f"{prefix}_{uuid.uuid4().hex[:12]}")
+        os.makedirs(job_dir)
+        self.touch(job_dir)
+        self.enforce_quota(keep=(job_dir,))
+        return job_dir
+
+    def touch(self, job_dir: str):
+        """
+        Refresh the job's lease: in use, so quota eviction skips it
+        """
+        if job_dir and os.path.isdir(job_dir):
+            with open(os.path.join(job_dir, LEASE_FILE), "a"):
+                pass
+            os.utime(os.path.join(job_dir, LEASE_FILE))
+            os.utime(job_dir)
+
+    def lease_age(self, job_dir: str):
+        """
+        Seconds since the lease was last refreshed, or None if not leased
+        """
+        try:
+            return time.time() - os.path.getmtime(os.path.join(job_dir, LEASE_FILE))
+        except OSError:
+            return None
+
+    def release(self, job_dir: str):
+        """
+        Delete a finished job and everything in it (lease included)
+        """
+        if job_dir and os.path.abspath(job_dir).startswith(os.path.abspath(self.root) + os.sep):
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+    def jobs(self) -> list:
+        """
+        (mtime, path) of every job, oldest first
+        """
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.isdir(path):
+                    entries.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        return sorted(entries)
+
+    def usage(self) -> int:
+        return _dir_size(self.root)
+
+    def enforce_quota(self, keep=(), extra_bytes: int = 0):
+        """
+        Evict expired jobs, then oldest unleased jobs until usage + extra_bytes
+        fits. Leased jobs are only evicted once the lease has expired.
+        """
+        keep = {os.path.abspath(k) for k in keep}
+        with self._lock:
+            now = time.time()
+            jobs = [(mtime, path, _dir_size(path)) for mtime, path in self.jobs()]
+            total = sum(size for _, _, size in jobs) + extra_bytes
+
+            for mtime, path, size in jobs:
+                if os.path.abspath(path) in keep:
+                    continue
+                lease_age = self.lease_age(path)
+                if lease_age is not None:
+                    # Sesi lain sedang memakai job ini (tracking / tab 3)
+                    if lease_age <= self.max_age_seconds:
+                        continue
+                    expired = True
+                else:
+                    expired = now - mtime > self.max_age_seconds
+                if not expired and total <= self.quota_bytes:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+    # ------------------------------------------
+    # Files
+    # ------------------------------------------
+    def save_upload(
+        self,
+        uploaded_file,
+        job_dir: str,
+        filename: str = "input.mp4",
+        chunk_size: int = UPLOAD_CHUNK_SIZE
+    ) -> str:
+        """
+        Stream a file-like upload (e.g. Streamlit UploadedFile) to disk
+        in chunks instead of reading it into memory
+        """
+        size = getattr(uploaded_file, "size", 0) or 0
+        self.enforce_quota(keep=(job_dir,), extra_bytes=size)
+
+        path = os.path.join(job_dir, filename)
+        uploaded_file.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(uploaded_file, f, chunk_size)
+        self.touch(job_dir)
+        return path
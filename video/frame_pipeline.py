@@ -0,0 +1,260 @@
+import os
+import queue
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+DEFAULT_QUEUE_SIZE = 32
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+# fourcc khusus: encode lewat ffmpeg/libx264, bisa diputar langsung di browser
+H264 = "h264"
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def _put(q, item, stop_event):
+    """Blocking put that gives up once the consumer has stopped"""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+class FramePipeline:
+    """
+    Decoder thread -> bounded queue -> worker pool -> ordered consumer.
+
+    Frames are decoded ahead on a background thread while the stages
+    run in a thread pool (OpenCV/NumPy release the GIL). The queue holds
+    at most queue_size frames in flight, so a slow consumer applies
+    backpressure to the decoder instead of growing memory.
+
+    Each stage is a callable stage(frame_idx, data) -> data; the first
+    stage receives the decoded BGR frame. Iterating yields
+    (frame_idx, result) in frame order.
+    """
+
+    def __init__(
+        self,
+        video_path: str,
+        stages=(),
+        workers=DEFAULT_WORKERS,
+        queue_size=DEFAULT_QUEUE_SIZE,
+        start=0,
+        stop=None
+    ):
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise IOError(f"Cannot open video: {video_path}")
+
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        self.stages = list(stages)
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.start = start
+        self.stop = stop
+
+    def _process(self, frame_idx, data):
+        for stage in self.stages:
+            data = stage(frame_idx, data)
+        return data
+
+    def _decode(self, q, pool, stop_event):
+        try:
+            if self.start:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start)
+
+            frame_idx = self.start
+            while not stop_event.is_set() and (self.stop is None or frame_idx < self.stop):
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                item = pool.submit(self._process, frame_idx, frame) if pool else frame
+                if not _put(q, (frame_idx, item), stop_event):
+                    return
+                frame_idx += 1
+        except Exception as exc:
+            _put(q, _Failure(exc), stop_event)
+        finally:
+            _put(q, _END, stop_event)
+
+    def __iter__(self):
+        q = queue.Queue(maxsize=self.queue_size)
+        stop_event = threading.Event()
+        pool = ThreadPoolExecutor(max_workers=self.workers) if self.stages else None
+        decoder = threading.Thread(target=self._decode, args=(q, pool, stop_event), daemon=True)
+        decoder.start()
+
+        try:
+            while True:
+                item = q.get()
+                if item is _END:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.exc
+
+                frame_idx, data = item
+                yield frame_idx, data.result() if pool else data
+        finally:
+            stop_event.set()
+            decoder.join()
+            if pool:
+                pool.shutdown(wait=True, cancel_futures=True)
+            self.cap.release()
+
+
+class FfmpegWriter:
+    """
+    cv2.VideoWriter-like writer that pipes raw frames into ffmpeg (libx264,
+    yuv420p, faststart), so the MP4 plays in a browser <video> element.
+    opencv-python-headless cannot encode H.264 itself.
+    """
+
+    def __init__(self, output_path: str, fps, size, is_color=True, crf=20, preset="veryfast"):
+        self.output_path = output_path
+        w, h = size
+        command = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24" if is_color else "gray",
+            "-s", f"{w}x{h}", "-r", str(fps), "-i", "-",
+            "-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+            "-pix_fmt", "yuv420p", "-movflags", "+faststart",
+            output_path
+        ]
+        try:
+            self.proc = subprocess.Popen(
+                command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            )
+        except OSError:
+            self.proc = None  # ffmpeg tidak terpasang
+
+    def isOpened(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def _failure(self):
+        stderr = self.proc.stderr.read().decode(errors="ignore").strip()
+        return IOError(f"ffmpeg failed writing {self.output_path}: {stderr}")
+
+    def write(self, frame):
+        try:
+            self.proc.stdin.write(frame.tobytes())
+        except BrokenPipeError:
+            self.proc.wait()
+            raise self._failure() from None
+
+    def release(self):
+        if self.proc is None or self.proc.returncode is not None:
+            return
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass  # ffmpeg sudah keluar; pesan error diambil di bawah
+        if self.proc.wait() != 0:
+            raise self._failure()
+
+
+class VideoEncoder:
+    """
+    cv2.VideoWriter (or FfmpegWriter for fourcc=H264) on its own thread
+    behind a bounded queue
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        fourcc: str,
+        fps,
+        size,
+        is_color=True,
+        queue_size=DEFAULT_QUEUE_SIZE
+    ):
+        if fourcc == H264:
+            self.writer = FfmpegWriter(output_path, fps, size, is_color=is_color)
+        else:
+            self.writer = cv2.VideoWriter(
+                output_path, cv2.VideoWriter_fourcc(*fourcc), fps, size, isColor=is_color
+            )
+        if not self.writer.isOpened():
+            # mis. 'avc1' pada build opencv-headless tanpa encoder H.264
+            raise IOError(f"Cannot open video writer ({fourcc}): {output_path}")
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.frames_written = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            frame = self.queue.get()
+            if frame is _END:
+                break
+            if self.error is not None:
+                continue  # tetap kosongkan queue agar producer tidak macet
+            try:
+                self.writer.write(frame)
+                self.frames_written += 1
+            except Exception as exc:
+                self.error = exc
+
+    def write(self, frame):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(frame)
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(_END)
+            self.thread.join()
+        self.writer.release()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.close()
+        except Exception:
+            if exc_type is None:
+                raise
+
+
+def transcode_video(
+    input_path: str,
+    output_path: str,
+    process,
+    fourcc="mp4v",
+    is_color=True,
+    fps=None,
+    workers=DEFAULT_WORKERS,
+    queue_size=DEFAULT_QUEUE_SIZE
+) -> int:
+    """
+    Decode -> process(frame_idx, frame) -> encode, all three overlapped.
+    Returns the number of frames written.
+    """
+    pipeline = FramePipeline(input_path, [process], workers=workers, queue_size=queue_size)
+    fps = pipeline.fps if fps is None else fps
+    size = (pipeline.width, pipeline.height)
+
+    with VideoEncoder(output_path, fourcc, fps, size, is_color=is_color, queue_size=queue_size) as encoder:
+        for _, frame in pipeline:
+            encoder.write(frame)
+
+    return encoder.frames_written